@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import MatchCache, TrackInfoCache
+from .catalog import CatalogIndex
+from .logcontext import account_context
+from .normalize import LRUCache
+from .ratelimit import RequestScheduler
+from .spotify import Spotify
+from .tunezinc import TuneZinc
+
+logger = logging.getLogger(__name__)
+
+
+class AccountSettings(object):
+    """
+    The settings of one account of a batch: those of config.py, overridden by the account's own.
+    Each account keeps its gmusic credentials, spotify token & sync state in files of its own.
+    """
+    # Settings of the batch as a whole, which accounts can't override
+    SHARED_SETTINGS = (
+        'TUNEZINC_CACHE_LOCATION',
+        'TUNEZINC_MATCH_CACHE_SIZE',
+        'TUNEZINC_MATCH_CACHE_MISS_TTL',
+        'TUNEZINC_CATALOG_LOCATION',
+        'TUNEZINC_CATALOG_SIZE',
+        'TUNEZINC_ACCOUNT_WORKERS',
+        'SPOTIFY_REQUESTS_PER_SECOND',
+        'SPOTIFY_MAX_RETRIES',
+    )
+    ACCOUNT_LOCATIONS = ('GMUSIC_CREDENTIALS_STORAGE_LOCATION', 'SPOTIFY_TOKEN_LOCATION', 'TUNEZINC_STATE_LOCATION')
+
+    def __init__(self, defaults, account, base_path='.'):
+        for setting in dir(defaults):
+            if setting.isupper():
+                setattr(self, setting, getattr(defaults, setting))
+
+        self.name = account.get('name') or account.get('SPOTIFY_USERNAME')
+        if not self.name:
+            raise ValueError("Every account needs a name or a SPOTIFY_USERNAME")
+        for setting in self.ACCOUNT_LOCATIONS:
+            setattr(self, setting, '{}.{}'.format(getattr(defaults, setting), self.name))
+
+        for setting, value in account.items():
+            if setting == 'name':
+                continue
+            if not setting.isupper() or not hasattr(defaults, setting):
+                raise ValueError("Unknown setting {} for account {}".format(setting, self.name))
+            if setting in self.SHARED_SETTINGS:
+                raise ValueError("{} is shared by every account, it can't be set for account {}".format(
+                    setting, self.name))
+
+            if setting == 'GMUSIC_PLAYLISTS' and not isinstance(value, list):
+                value = re.split(r'\s*;\s*', value.strip())
+            elif setting.endswith('_LOCATION'):
+                value = os.path.join(base_path, value)
+            setattr(self, setting, value)
+
+
+class BatchRunner(object):
+    """
+    Syncs several accounts in one process, up to TUNEZINC_ACCOUNT_WORKERS of them at once. The
+    accounts share a single connection pool & rate limit, the match & track info caches, the
+    catalog of spotify tracks, and the searches made during the run, so one account's searches
+    spare the others theirs. A failing account doesn't stop the others.
+    """
+
+    def __init__(self, config, accounts):
+        self.config = config
+        self.accounts = accounts
+        self.workers = max(1, min(config.TUNEZINC_ACCOUNT_WORKERS, len(accounts) or 1))
+        self.scheduler = RequestScheduler(
+            rate=config.SPOTIFY_REQUESTS_PER_SECOND,
+            max_retries=config.SPOTIFY_MAX_RETRIES,
+            pool_size=config.SPOTIFY_SEARCH_WORKERS * config.TUNEZINC_PLAYLIST_WORKERS * self.workers,
+        )
+        self.match_cache = MatchCache(
+            config.TUNEZINC_CACHE_LOCATION,
+            max_entries=config.TUNEZINC_MATCH_CACHE_SIZE,
+            miss_ttl=config.TUNEZINC_MATCH_CACHE_MISS_TTL,
+        )
+        self.track_info_cache = TrackInfoCache(config.TUNEZINC_CACHE_LOCATION)
+        self.catalog = CatalogIndex(config.TUNEZINC_CATALOG_LOCATION, max_entries=config.TUNEZINC_CATALOG_SIZE)
+        self.searches = LRUCache(maxsize=Spotify.SEARCH_MEMO_SIZE)
+
+    @classmethod
+    def from_file(cls, config, path):
+        """
+        Reads the accounts from a JSON file holding a list of objects, each with a `name` and the
+        config.py settings that differ for the account. Relative locations are relative to the file.
+        """
+        with open(path) as accounts_file:
+            accounts = json.load(accounts_file)
+        base_path = os.path.dirname(os.path.abspath(path))
+        return cls(config, [AccountSettings(config, account, base_path) for account in accounts])
+
+    def tunezinc(self, account):
+        return TuneZinc(
+            account,
+            scheduler=self.scheduler,
+            match_cache=self.match_cache,
+            track_info_cache=self.track_info_cache,
+            searches=self.searches,
+            catalog=self.catalog,
+        )
+
+    def run(self, full=False, reconcile=False):
+        """
+        Syncs (or reconciles) every account. Returns a summary of each account, in order: its `name`,
+        whether it synced `ok`, the `playlists` dict sync returned (None if it failed before
+        syncing any), the `error` it failed with, and the `seconds` it took.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            summaries = list(executor.map(
+                lambda account: self._run_account(account, full, reconcile), self.accounts))
+
+        for summary in summaries:
+            playlists = summary['playlists'] or {}
+            touched = sum(count for count in playlists.values() if count)
+            if summary['ok']:
+                logger.info("Account {name}: synced {count} playlist(s), {touched} track(s) in {seconds:.1f}s".format(
+                    count=len(playlists), touched=touched, **summary
+                ))
+            else:
+                failed = [name for name, count in playlists.items() if count is None]
+                logger.error("Account {name}: failed ({reason}) in {seconds:.1f}s".format(
+                    reason=summary['error'] or '{} playlist(s) failed'.format(len(failed)), **summary))
+        return summaries
+
+    def _run_account(self, account, full, reconcile):
+        summary = {'name': account.name, 'ok': False, 'playlists': None, 'error': None}
+        started = time.monotonic()
+        with account_context(account.name):
+            tunezinc = None
+            try:
+                tunezinc = self.tunezinc(account)
+                if reconcile:
+                    summary['playlists'] = tunezinc.reconcile()
+                else:
+                    summary['playlists'] = tunezinc.sync(full=full)
+                summary['ok'] = None not in summary['playlists'].values()
+            except Exception as e:
+                logger.exception("Failed to sync account")
+                summary['error'] = str(e) or e.__class__.__name__
+            finally:
+                if tunezinc is not None:
+                    tunezinc.close()
+                summary['seconds'] = time.monotonic() - started
+        return summary
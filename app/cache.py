@@ -0,0 +1,157 @@
+import logging
+import sqlite3
+import threading
+import time
+
+from .records import GmusicTrack
+
+logger = logging.getLogger(__name__)
+
+
+class MatchCache(object):
+    """
+    Remembers which spotify uri each gmusic track resolved to, and which tracks couldn't be found,
+    across runs so the same searches aren't repeated. Misses expire after `miss_ttl` seconds so
+    they're eventually searched for again, and at most `max_entries` are kept, evicting the least
+    recently used.
+    """
+    MISSING = object()
+
+    def __init__(self, path, max_entries=100000, miss_ttl=7 * 24 * 60 * 60):
+        self.path = path
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS matches (
+                key TEXT PRIMARY KEY,
+                spotify_uri TEXT,
+                updated_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS matches_used_at ON matches (used_at)')
+        self._db.commit()
+
+    def get(self, key):
+        """
+        Returns the cached spotify uri for the key, MISSING if it's a known miss, or None if the key
+        isn't in the cache (or its miss has expired)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT spotify_uri, updated_at FROM matches WHERE key = ?', (key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            spotify_uri, updated_at = row
+            if not spotify_uri and updated_at + self.miss_ttl < now:
+                return None
+
+            self._db.execute('UPDATE matches SET used_at = ? WHERE key = ?', (now, key))
+
+        return spotify_uri or self.MISSING
+
+    def set(self, key, spotify_uri):
+        """
+        Records the spotify uri a key resolved to, or a miss when spotify_uri is None
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO matches (key, spotify_uri, updated_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, spotify_uri, now, now)
+            )
+
+    def invalidate(self, key):
+        with self._lock:
+            self._db.execute('DELETE FROM matches WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM matches')
+            self._db.commit()
+        logger.info("Cleared the track match cache")
+
+    def commit(self):
+        """
+        Evicts everything past `max_entries` and writes the pending changes to disk
+        """
+        with self._lock:
+            self._db.execute(
+                'DELETE FROM matches WHERE key IN ('
+                'SELECT key FROM matches ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+
+class TrackInfoCache(object):
+    """
+    Persists the title, artist, album & duration of gmusic tracks by id, so uploaded songs, whose
+    playlist entries don't carry their info, only need to be looked up once
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(track_info)')]
+        if columns and 'duration_ms' not in columns:
+            # Cached before durations were, so the songs are looked up again rather than matched without one
+            logger.info("Dropping the track info cached without durations")
+            self._db.execute('DROP TABLE track_info')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS track_info (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                duration_ms INTEGER
+            )
+        """)
+        self._db.commit()
+
+    def get_many(self, track_ids):
+        """
+        Returns a GmusicTrack for those of the track ids that are in the cache, by id
+        """
+        track_ids = list(track_ids)
+        track_infos = {}
+        with self._lock:
+            # Stay well below sqlite's limit on the number of query parameters
+            for start in range(0, len(track_ids), 500):
+                chunk = track_ids[start:start + 500]
+                rows = self._db.execute(
+                    'SELECT id, title, artist, album, duration_ms FROM track_info WHERE id IN ({})'.format(
+                        ', '.join('?' * len(chunk))),
+                    chunk
+                )
+                for row in rows:
+                    track_infos[row[0]] = GmusicTrack(*row)
+        return track_infos
+
+    def set_many(self, gmusic_tracks):
+        """
+        Caches the GmusicTracks by id
+        """
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO track_info (id, title, artist, album, duration_ms) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (track_id, gmusic_track.title, gmusic_track.artist, gmusic_track.album, gmusic_track.duration_ms)
+                    for track_id, gmusic_track in gmusic_tracks.items()
+                ]
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM track_info')
+            self._db.commit()
@@ -0,0 +1,130 @@
+import logging
+import sqlite3
+import threading
+import time
+
+from .instrumentation import metrics
+from .normalize import clean_term
+from .records import SpotifyTrack
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogIndex(object):
+    """
+    Every spotify track seen in search results & playlists, persisted with an inverted index from
+    each track's cleaned name to its uri. The exact matcher only accepts spotify tracks named one of
+    a track's title candidates, so looking those up finds every catalogued track that could match
+    it, without a search request. At most `max_entries` tracks are kept, evicting those least
+    recently seen. The database is memory mapped, so lookups mostly read straight from the page
+    cache.
+    """
+    # How much of the database to memory map
+    MMAP_SIZE = 256 * 1024 * 1024
+    ARTIST_SEPARATOR = u'\x1f'
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._added = False
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA mmap_size={:d}'.format(self.MMAP_SIZE))
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                uri TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                artists TEXT NOT NULL,
+                album TEXT,
+                duration_ms INTEGER,
+                seen_at REAL NOT NULL
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS tracks_seen_at ON tracks (seen_at)')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS titles (
+                title TEXT NOT NULL,
+                uri TEXT NOT NULL,
+                PRIMARY KEY (title, uri)
+            ) WITHOUT ROWID
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS titles_uri ON titles (uri)')
+        self._db.commit()
+
+    def add(self, spotify_tracks):
+        """
+        Catalogs the SpotifyTracks, skipping playlist items that aren't tracks
+        """
+        now = time.time()
+        rows = [
+            (
+                spotify_track.uri,
+                spotify_track.name,
+                self.ARTIST_SEPARATOR.join(artist or u'' for artist in spotify_track.artists),
+                spotify_track.album,
+                spotify_track.duration_ms,
+                now,
+            )
+            for spotify_track in spotify_tracks
+            if spotify_track.uri and spotify_track.name is not None
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO tracks (uri, name, artists, album, duration_ms, seen_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO titles (title, uri) VALUES (?, ?)',
+                [(clean_term(name), uri) for uri, name, artists, album, duration_ms, seen_at in rows]
+            )
+            self._added = True
+
+    def find(self, track):
+        """
+        Returns the most recently seen catalogued SpotifyTrack matching the Track, or None
+        """
+        titles = list(track.spotify_title_candidates())
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tracks.uri, name, artists, album, duration_ms FROM titles '
+                'JOIN tracks ON tracks.uri = titles.uri '
+                'WHERE title IN ({}) ORDER BY seen_at DESC'.format(', '.join('?' * len(titles))),
+                titles
+            ).fetchall()
+
+        compared = 0
+        try:
+            for uri, name, artists, album, duration_ms in rows:
+                compared += 1
+                spotify_track = SpotifyTrack(
+                    uri, name, artists.split(self.ARTIST_SEPARATOR) if artists else (), album, duration_ms)
+                if track.matches_spotify_track(spotify_track):
+                    return spotify_track
+            return None
+        finally:
+            metrics.increment('matcher.comparisons', compared)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM titles')
+            self._db.execute('DELETE FROM tracks')
+            self._db.commit()
+        logger.info("Cleared the spotify catalog")
+
+    def commit(self):
+        """
+        Evicts the tracks past `max_entries` if any were added, and writes the pending changes to disk
+        """
+        with self._lock:
+            if self._added:
+                evicted = 'SELECT uri FROM tracks ORDER BY seen_at DESC LIMIT -1 OFFSET ?'
+                self._db.execute('DELETE FROM titles WHERE uri IN ({})'.format(evicted), (self.max_entries,))
+                self._db.execute('DELETE FROM tracks WHERE uri IN ({})'.format(evicted), (self.max_entries,))
+                self._added = False
+            self._db.commit()
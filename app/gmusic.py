@@ -1,24 +1,38 @@
 import logging
 from datetime import datetime, time
 import os
+import threading
 
 import pytz
 from cached_property import cached_property
-from gmusicapi import Mobileclient, Musicmanager
+
+from .instrumentation import metrics
+from .records import GmusicTrack, PlaylistEntry
 
 logger = logging.getLogger(__name__)
 
 
 class Gmusic(object):
-
-    def __init__(self, playlists_to_sync, credentials_storage_location, debug):
+    """
+    The gmusicapi clients are slow to import & create, so gmusicapi is only imported, and each
+    client only created, once it's first needed
+    """
+    _client = None
+    _manager = None
+
+    def __init__(self, playlists_to_sync, credentials_storage_location, debug, track_info_cache=None):
         self.playlists_to_sync = playlists_to_sync
         self.credentials_storage_location = credentials_storage_location
-        self._client = Mobileclient(debug_logging=debug)
-        self._manager = Musicmanager(debug_logging=debug)
-
+        self.debug = debug
+        self.track_info_cache = track_info_cache
+        self._clients_lock = threading.Lock()
+        self._uploaded_songs_lock = threading.Lock()
+        self._entries_lock = threading.Lock()
+        self._entries = None
 
     def client_login(self):
+        from gmusicapi import Mobileclient
+
         credentials = self.credentials_storage_location
 
         if not os.path.isfile(credentials):
@@ -57,34 +71,122 @@ class Gmusic(object):
 
     @property
     def client(self):
-        if not self._client.is_authenticated():
-            self.client_login()
+        with self._clients_lock:
+            if self._client is None:
+                from gmusicapi import Mobileclient
+                self._client = Mobileclient(debug_logging=self.debug)
+            if not self._client.is_authenticated():
+                self.client_login()
         return self._client
 
     @property
     def manager(self):
-        if not self._manager.is_authenticated():
-            self.manager_login()
+        with self._clients_lock:
+            if self._manager is None:
+                from gmusicapi import Musicmanager
+                self._manager = Musicmanager(debug_logging=self.debug)
+            if not self._manager.is_authenticated():
+                self.manager_login()
         return self._manager
 
-    @cached_property
-    def uploaded_songs(self):
-        return {song['id']: song for song in self.manager.get_uploaded_songs()}
-
-    @property
-    def _playlists(self):
-        playlists = self.client.get_all_user_playlist_contents()
-        logger.debug("Loaded {} playlists".format(len(playlists)))
-        return playlists
+    def get_uploaded_songs(self, track_ids):
+        """
+        Returns a GmusicTrack for each of the uploaded songs by id, from the track info cache where
+        possible. The uploaded library is only paged through (caching what it contains) until
+        the rest have been found.
+        """
+        track_ids = set(track_ids)
+        if not track_ids:
+            return {}
+
+        cache = self.track_info_cache
+        songs = cache.get_many(track_ids) if cache else {}
+        metrics.cache_lookup('track_info', hits=len(songs), misses=len(track_ids) - len(songs))
+        if len(songs) == len(track_ids):
+            return songs
+
+        with self._uploaded_songs_lock:
+            # Another playlist may have paged through the library while we waited
+            if cache:
+                songs.update(cache.get_many(track_ids - set(songs)))
+            remaining = track_ids - set(songs)
+
+            if remaining:
+                logger.debug("Looking up {} uploaded song(s)".format(len(remaining)))
+                for chunk in self.manager.get_uploaded_songs(incremental=True):
+                    metrics.increment('gmusic.uploaded_song_pages')
+                    chunk_songs = {song['id']: GmusicTrack.from_track_info(song) for song in chunk}
+                    if cache:
+                        cache.set_many(chunk_songs)
+
+                    for track_id in remaining.intersection(chunk_songs):
+                        songs[track_id] = chunk_songs[track_id]
+                    remaining.difference_update(chunk_songs)
+                    if not remaining:
+                        break
+
+                if remaining:
+                    logger.debug("{} song(s) not found among the uploaded songs".format(len(remaining)))
+                    if cache:
+                        # Remember they're unknown so the library isn't paged through for them again
+                        cache.set_many({track_id: GmusicTrack(track_id) for track_id in remaining})
+
+        return songs
 
     @cached_property
     def playlists(self):
+        """
+        The playlists to sync, without their entries, which are only loaded by get_playlist_entries
+        """
+        playlists = self.client.get_all_playlists()
+        logger.debug("Loaded {} playlists".format(len(playlists)))
+
         playlists_to_sync = []
-        for playlist in self._playlists:
+        for playlist in playlists:
+            if playlist.get('type') == 'SHARED':
+                continue
             if playlist['name'] in self.playlists_to_sync:
                 playlists_to_sync.append(playlist)
         return playlists_to_sync
 
+    def refresh(self):
+        """
+        Forgets the playlists to sync, and their loaded entries, so they're listed again
+        """
+        self.__dict__.pop('playlists', None)
+        with self._entries_lock:
+            self._entries = None
+
+    def _load_entries(self):
+        """
+        Returns the PlaylistEntry records of each playlist to sync, by playlist id. The mobile client
+        can only page through the entries of every playlist at once, so they're all loaded together,
+        once, keeping only those of the playlists to sync.
+        """
+        with self._entries_lock:
+            if self._entries is None:
+                entries = {}
+                for playlist in self.client.get_all_user_playlist_contents():
+                    if playlist['name'] not in self.playlists_to_sync:
+                        continue
+                    entries[playlist['id']] = [
+                        PlaylistEntry.from_entry(entry)
+                        for entry in playlist.get('tracks') or []
+                        if not entry.get('deleted')
+                    ]
+                logger.debug("Loaded the entries of {} playlists".format(len(entries)))
+                self._entries = entries
+            return self._entries
+
+    def get_playlist_entries(self, playlist):
+        """
+        Returns the playlist's entries as PlaylistEntry records, loading them the first time
+        """
+        if 'tracks' not in playlist:
+            playlist['tracks'] = self._load_entries().get(playlist['id'], [])
+            logger.debug("Loaded {} entries of playlist '{}'".format(len(playlist['tracks']), playlist['name']))
+        return playlist['tracks']
+
     def get_latest_addition_date(self, playlist):
         lastModified = playlist.get('lastModifiedTimestamp')
         if lastModified:
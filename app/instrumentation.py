@@ -0,0 +1,129 @@
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class Metrics(object):
+    """
+    Thread safe timings of each phase of a sync run, and counters of what it did: API calls, bytes
+    received, cache hits & misses, track comparisons. Phases running on several threads at once
+    (searches, adds) accumulate the time spent on each thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._phases = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+            self._counters = Counter()
+            self._caches = defaultdict(lambda: {'hits': 0, 'misses': 0})
+            self._memory = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._phases[name]['seconds'] += elapsed
+                self._phases[name]['calls'] += 1
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def cache_lookup(self, name, hits=0, misses=0):
+        with self._lock:
+            self._caches[name]['hits'] += hits
+            self._caches[name]['misses'] += misses
+
+    def record_response(self, response, *args, **kwargs):
+        """
+        A requests response hook counting the requests made and the bytes they received
+        """
+        with self._lock:
+            self._counters['http.requests'] += 1
+            self._counters['http.bytes_received'] += len(response.content)
+
+    def record_memory(self, top=10):
+        """
+        Records tracemalloc's peak memory & biggest allocation sites, if it's tracing
+        """
+        if not tracemalloc.is_tracing():
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics('lineno')[:top]
+        with self._lock:
+            self._memory = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top': [
+                    {'location': str(statistic.traceback), 'bytes': statistic.size, 'count': statistic.count}
+                    for statistic in statistics
+                ],
+            }
+
+    def summary(self):
+        with self._lock:
+            summary = {
+                'duration': time.time() - self.started,
+                'phases': {name: dict(phase) for name, phase in self._phases.items()},
+                'counters': dict(self._counters),
+                'caches': {},
+            }
+            for name, cache in self._caches.items():
+                lookups = cache['hits'] + cache['misses']
+                summary['caches'][name] = dict(cache, hit_rate=cache['hits'] / lookups if lookups else None)
+            if self._memory:
+                summary['memory'] = self._memory
+        return summary
+
+    def write(self, path):
+        """
+        Writes the summary as JSON to the path, or to stdout when it's '-'
+        """
+        if path == '-':
+            json.dump(self.summary(), sys.stdout, indent=2)
+            sys.stdout.write('\n')
+            return
+
+        with open(path, 'w') as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def profiled(profile_path=None, trace_memory=False):
+    """
+    Profiles the block with cProfile, dumping the stats to profile_path, and/or traces its memory
+    allocations with tracemalloc into the metrics summary
+    """
+    profiler = None
+    if profile_path:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if trace_memory:
+            metrics.record_memory()
+            tracemalloc.stop()
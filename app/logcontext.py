@@ -0,0 +1,66 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+_context = threading.local()
+
+
+def current_playlist():
+    return getattr(_context, 'playlist', None)
+
+
+def current_account():
+    return getattr(_context, 'account', None)
+
+
+@contextmanager
+def account_context(name):
+    """
+    Tags every record logged by the current thread with the name of the account being synced
+    """
+    previous = current_account()
+    _context.account = name
+    try:
+        yield
+    finally:
+        _context.account = previous
+
+
+@contextmanager
+def playlist_context(name):
+    """
+    Tags every record logged by the current thread with the name of the playlist being synced
+    """
+    previous = current_playlist()
+    _context.playlist = name
+    try:
+        yield
+    finally:
+        _context.playlist = previous
+
+
+def bind(func):
+    """
+    Wraps func so it logs under the calling thread's account & playlist when it's run on another
+    thread
+    """
+    account = current_account()
+    playlist = current_playlist()
+
+    def wrapper(*args, **kwargs):
+        with account_context(account), playlist_context(playlist):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class PlaylistContextFilter(logging.Filter):
+    """
+    Adds a `playlist` attribute, '[account] [name] ' or as much of it as is known, to records for
+    log formats to include
+    """
+
+    def filter(self, record):
+        record.playlist = ''.join(
+            '[{}] '.format(name) for name in (current_account(), current_playlist()) if name
+        )
+        return True
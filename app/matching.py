@@ -0,0 +1,55 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .instrumentation import metrics
+
+# Below this many tracks a process of its own, the cost of starting it & sending it the index
+# outweighs what it saves
+MIN_TRACKS_PER_PROCESS = 5000
+
+# The PlaylistIndex snapshot a worker process matches against, sent once when the process starts
+_playlist_index = None
+
+
+def _load_index(playlist_index):
+    global _playlist_index
+    _playlist_index = playlist_index
+
+
+def _find_positions(tracks):
+    """
+    Returns the position in the worker's index of the item matching each of the tracks (or None),
+    and how many items were compared to find them
+    """
+    compared = metrics.summary()['counters'].get('matcher.comparisons', 0)
+    positions = [_playlist_index.find_position(track) for track in tracks]
+    return positions, metrics.summary()['counters'].get('matcher.comparisons', 0) - compared
+
+
+def find_in_index(playlist_index, tracks, processes=1):
+    """
+    Returns the first item of the PlaylistIndex matching each of the tracks (or None), in order.
+    With several processes, the tracks are split into contiguous shards matched in worker processes
+    that each get a snapshot of the index, and their results are put back in order, so they're the same
+    as matching the tracks one after the other.
+    """
+    processes = min(processes, len(tracks) // MIN_TRACKS_PER_PROCESS)
+    if processes <= 1:
+        return [playlist_index.find(track) for track in tracks]
+
+    shard_size = -(-len(tracks) // processes)
+    shards = [tracks[start:start + shard_size] for start in range(0, len(tracks), shard_size)]
+    # Spawn rather than fork the workers, forking a process with threads running isn't safe
+    with ProcessPoolExecutor(
+        max_workers=len(shards),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_load_index,
+        initargs=(playlist_index.snapshot(),),
+    ) as executor:
+        results = list(executor.map(_find_positions, shards))
+
+    items = []
+    for positions, compared in results:
+        metrics.increment('matcher.comparisons', compared)
+        items.extend(playlist_index.items[position] if position is not None else None for position in positions)
+    return items
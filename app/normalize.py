@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+
+def clean_term(term):
+    """
+    The form of a title, artist or album name that tracks are matched on
+    """
+    return term.replace("&", "and").strip().lower()
+
+
+class LRUCache(object):
+    """
+    A small thread safe, size bounded mapping that evicts the least recently used entry
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def setdefault(self, key, value):
+        """
+        Returns the key's value, setting it to `value` first if the key isn't there
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def discard(self, key, value):
+        """
+        Removes the key only if it's still set to `value` (the same object), not to one set since.
+        Returns whether it was removed.
+        """
+        with self._lock:
+            if self._data.get(key) is not value:
+                return False
+            del self._data[key]
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TrackForms(object):
+    """
+    The canonical forms of a local (gmusic) track that the matching predicates compare against
+    """
+    __slots__ = (
+        'title',
+        'featuring',
+        'featuring_title',
+        'title_base',
+        'title_variants',
+        'title_candidates',
+        'artist',
+        'album',
+        'album_variants',
+        'album_base',
+        'album_has_edition',
+        'search_title',
+        'search_album',
+    )
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+
+class SpotifyTrackForms(object):
+    """
+    The canonical forms of a SpotifyTrack that the matching predicates compare against
+    """
+    __slots__ = (
+        'title',
+        'title_base',
+        'artist_names',
+        'artists_joined',
+        'album',
+        'album_dash',
+        'album_base',
+        'album_has_edition',
+    )
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
@@ -0,0 +1,131 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from spotipy import SpotifyException
+
+from .instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """
+    Hands out up to `rate` tokens a second, allowing bursts of up to `capacity` tokens. A rate of 0
+    disables throttling.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens to everyone for the given number of seconds
+        """
+        with self._lock:
+            paused_until = time.monotonic() + seconds
+            if paused_until > self._paused_until:
+                self._paused_until = paused_until
+                self._tokens = 0
+                self._updated = paused_until
+
+
+class RequestScheduler(object):
+    """
+    Runs API calls through a shared token bucket, retrying rate limited (429) calls after their
+    Retry-After delay and transient failures with jittered exponential backoff. It also owns the
+    pooled keep-alive session the calls are made with.
+
+    A call that isn't idempotent, like adding tracks, may have been carried out even though it
+    failed or timed out, so it's only retried when it certainly wasn't: when it was rate limited,
+    or couldn't connect at all.
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate=10, burst=None, max_retries=5, backoff_base=0.5, backoff_cap=30,
+                 pool_size=10):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.session = requests.Session()
+        self.session.hooks['response'].append(metrics.record_response)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff(self, attempt):
+        """
+        How long to wait before the given retry of a failed request, jittered
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _retry_after(self, exception):
+        try:
+            return float(exception.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        attempt = 0
+        retry_statuses = self.RETRY_STATUSES if idempotent else (429,)
+        retry_errors = (requests.ConnectionError, requests.Timeout) if idempotent else (requests.ConnectTimeout,)
+        while True:
+            self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status not in retry_statuses or attempt >= self.max_retries:
+                    raise
+
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                else:
+                    # Add a little jitter so everyone waiting on the same Retry-After doesn't
+                    # stampede the API at once
+                    delay += random.uniform(0, self.backoff_base)
+
+                if e.http_status == 429:
+                    self.bucket.pause(delay)
+                    metrics.increment('spotify.rate_limited')
+                metrics.increment('spotify.retries')
+
+                logger.warning("Spotify request failed with status {}, retrying in {:.1f}s".format(
+                    e.http_status, delay))
+            except retry_errors as e:
+                if attempt >= self.max_retries:
+                    raise
+
+                delay = self.backoff(attempt)
+                logger.warning("Spotify request failed ({}), retrying in {:.1f}s".format(e, delay))
+                metrics.increment('spotify.retries')
+
+            attempt += 1
+            time.sleep(delay)
@@ -0,0 +1,244 @@
+from bisect import bisect_left
+from collections import Counter, deque
+
+# The most tracks the API will add or remove in a single request
+BATCH_SIZE = 100
+
+
+def tokens(uris):
+    """
+    Tells apart the occurrences of the same uri: the nth occurrence of a uri becomes (uri, n)
+    """
+    occurrences = Counter()
+    result = []
+    for uri in uris:
+        result.append((uri, occurrences[uri]))
+        occurrences[uri] += 1
+    return result
+
+
+def target_uris(current, uris):
+    """
+    Returns the uris a playlist holding the `current` uris should hold for entries resolved to
+    `uris`, in order. An entry that couldn't be resolved (None) keeps the track standing in for it:
+    the playlist's track that no resolved entry accounts for, at the same place, after the track of
+    the resolved entry before it.
+    """
+    resolved = Counter(uri for uri in uris if uri)
+    claimed = Counter()
+    stand_ins = {}
+    anchor = None
+    for uri, occurrence in tokens(current):
+        if occurrence < resolved[uri]:
+            anchor = (uri, occurrence)
+        else:
+            stand_ins.setdefault(anchor, deque()).append(uri)
+
+    result = []
+    anchor = None
+    for uri in uris:
+        if uri:
+            anchor = (uri, claimed[uri])
+            claimed[uri] += 1
+            result.append(uri)
+        elif stand_ins.get(anchor):
+            result.append(stand_ins[anchor].popleft())
+    return result
+
+
+def longest_increasing_subsequence(sequence):
+    """
+    Returns the indices of a longest strictly increasing subsequence of the sequence
+    """
+    tails = []
+    tail_indices = []
+    previous = [None] * len(sequence)
+    for index, value in enumerate(sequence):
+        position = bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[position] = value
+            tail_indices[position] = index
+        previous[index] = tail_indices[position - 1] if position else None
+
+    indices = []
+    index = tail_indices[-1] if tail_indices else None
+    while index is not None:
+        indices.append(index)
+        index = previous[index]
+    return indices[::-1]
+
+
+class PositionIndex(object):
+    """
+    The positions of the tracks of a playlist as tracks are placed, in target order, each right
+    after the one placed before it. Only placed tracks move, so every track keeps a key of the slot
+    (its position in the playlist before any were placed) it's at or was placed after, and how far
+    after it: the tracks are in key order. A binary indexed tree over the number of tracks at each
+    slot gives a key's position in O(log n), rather than searching the playlist for the track.
+    """
+
+    def __init__(self, playlist):
+        # Slot 0 is the start of the playlist, the tracks start at slot 1
+        self._tree = [0] * (len(playlist) + 2)
+        self.keys = {}
+        self._add(0, 1)
+        for index, token in enumerate(playlist, start=1):
+            self.keys[token] = (index, 0)
+            self._add(index, 1)
+        self.last = (0, 0)
+
+    def _add(self, slot, count):
+        slot += 1
+        while slot < len(self._tree):
+            self._tree[slot] += count
+            slot += slot & -slot
+
+    def _before(self, slot):
+        """
+        The number of tracks at the slots before `slot`
+        """
+        total = 0
+        while slot > 0:
+            total += self._tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def position(self, token):
+        slot, offset = self.keys[token]
+        return self._before(slot) + offset - 1
+
+    def insert_before(self):
+        """
+        Where the next track placed goes: right after the last one placed
+        """
+        slot, offset = self.last
+        return self._before(slot) + offset
+
+    def follows(self, token, following):
+        """
+        Whether `following` is the track right after `token`, neither of them placed yet
+        """
+        slot, offset = self.keys[token]
+        following_slot, following_offset = self.keys.get(following, (None, None))
+        return (following_offset == 0 and following_slot is not None and following_slot > slot and
+                self._before(following_slot) == self._before(slot + 1))
+
+    def place(self, run, moved=True):
+        """
+        Places the run of tracks after the last one placed, or marks the run as placed where it
+        already is
+        """
+        if not moved:
+            self.last = self.keys[run[-1]]
+            return
+
+        slot, offset = self.last
+        for token in run:
+            if token in self.keys:
+                self._add(self.keys[token][0], -1)
+            offset += 1
+            self.keys[token] = (slot, offset)
+        self._add(slot, len(run))
+        self.last = (slot, offset)
+
+
+def edit_script(current, target):
+    """
+    Returns the operations turning the `current` list of uris into the `target` one with the
+    fewest tracks touched, each operation's positions relative to the playlist as the operations
+    before it left it:
+
+    - ('remove', [{'uri': uri, 'positions': [position, ...]}, ...]) for up to BATCH_SIZE uris
+    - ('add', [uri, ...], position) for up to BATCH_SIZE uris
+    - ('reorder', range_start, range_length, insert_before)
+
+    Tracks that aren't in the target are removed, those that aren't in the playlist are added, and
+    of the others, those outside of a longest run already in the target order are moved. Tracks to
+    add and to move are placed right after the track preceding them in the target, in target order,
+    so runs of neighbouring tracks are added & moved together.
+    """
+    current_tokens = tokens(current)
+    target_tokens = tokens(target)
+    target_positions = {token: position for position, token in enumerate(target_tokens)}
+
+    operations = []
+    playlist = list(current_tokens)
+
+    # Removals, a batch of uris at a time
+    removed = [token for token in current_tokens if token not in target_positions]
+    while removed:
+        batch_uris = []
+        for uri, occurrence in removed:
+            if uri not in batch_uris:
+                if len(batch_uris) == BATCH_SIZE:
+                    break
+                batch_uris.append(uri)
+        batch_uri_set = set(batch_uris)
+        batch = set(token for token in removed if token[0] in batch_uri_set)
+
+        positions = {}
+        for position, token in enumerate(playlist):
+            if token in batch:
+                positions.setdefault(token[0], []).append(position)
+        operations.append(('remove', [{'uri': uri, 'positions': positions[uri]} for uri in batch_uris]))
+
+        playlist = [token for token in playlist if token not in batch]
+        removed = [token for token in removed if token not in batch]
+
+    # The kept tracks already in target order stay where they are
+    stable = set(
+        playlist[index]
+        for index in longest_increasing_subsequence([target_positions[token] for token in playlist])
+    )
+    present = set(playlist)
+    positions = PositionIndex(playlist)
+
+    position = 0
+    while position < len(target_tokens):
+        token = target_tokens[position]
+        if token in stable:
+            positions.place([token], moved=False)
+            position += 1
+            continue
+
+        insert_before = positions.insert_before()
+        if token in present:
+            range_start = positions.position(token)
+            run = [token]
+            while (position + len(run) < len(target_tokens) and
+                   target_tokens[position + len(run)] not in stable and
+                   positions.follows(run[-1], target_tokens[position + len(run)])):
+                run.append(target_tokens[position + len(run)])
+
+            moved = range_start != insert_before
+            if moved:
+                operations.append(('reorder', range_start, len(run), insert_before))
+            positions.place(run, moved)
+        else:
+            run = []
+            while (position + len(run) < len(target_tokens) and len(run) < BATCH_SIZE and
+                   target_tokens[position + len(run)] not in present):
+                run.append(target_tokens[position + len(run)])
+            operations.append(('add', [uri for uri, occurrence in run], insert_before))
+            positions.place(run)
+        position += len(run)
+
+    return operations
+
+
+def tracks_touched(operations):
+    """
+    The number of tracks an edit script removes, adds or moves
+    """
+    touched = 0
+    for operation in operations:
+        if operation[0] == 'remove':
+            touched += sum(len(track['positions']) for track in operation[1])
+        elif operation[0] == 'add':
+            touched += len(operation[1])
+        else:
+            touched += operation[2]
+    return touched
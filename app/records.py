@@ -0,0 +1,99 @@
+import sys
+
+
+def intern(value):
+    """
+    Interns strings repeated across many tracks, like artist & album names, so they're only kept
+    in memory once
+    """
+    return sys.intern(value) if value else value
+
+
+class GmusicTrack(object):
+    """
+    The parts of a gmusic track's info that syncing uses
+    """
+    __slots__ = ('id', 'title', 'artist', 'album', 'duration_ms')
+
+    def __init__(self, id, title=u'', artist=u'', album=u'', duration_ms=None):
+        self.id = id
+        self.title = title
+        self.artist = intern(artist)
+        self.album = intern(album)
+        self.duration_ms = duration_ms
+
+    @classmethod
+    def from_track_info(cls, track_info):
+        duration_ms = track_info.get('durationMillis')
+        return cls(
+            track_info.get('storeId') or track_info.get('nid') or track_info.get('id'),
+            track_info.get('title') or u'',
+            track_info.get('artist') or u'',
+            track_info.get('album') or u'',
+            int(duration_ms) if duration_ms else None,
+        )
+
+    def __repr__(self):
+        return 'GmusicTrack({!r}, {!r}, {!r}, {!r})'.format(self.id, self.title, self.artist, self.album)
+
+
+class PlaylistEntry(object):
+    """
+    An entry of a gmusic playlist: its id, the id of its track, and the track's info, which the
+    entries of uploaded songs don't include
+    """
+    __slots__ = ('id', 'track_id', 'track')
+
+    def __init__(self, id, track_id, track=None):
+        self.id = id
+        self.track_id = track_id
+        self.track = track
+
+    @classmethod
+    def from_entry(cls, entry):
+        track_info = entry.get('track')
+        return cls(
+            entry['id'],
+            entry.get('trackId'),
+            GmusicTrack.from_track_info(track_info) if track_info else None,
+        )
+
+    def __repr__(self):
+        return 'PlaylistEntry({!r}, {!r}, {!r})'.format(self.id, self.track_id, self.track)
+
+
+class SpotifyTrack(object):
+    """
+    The parts of a spotify track (or playlist item, with its addition date) that syncing uses.
+    The items of playlists that aren't tracks have neither a uri nor a name.
+    """
+    __slots__ = ('uri', 'name', 'artists', 'album', 'duration_ms', 'added_at')
+
+    def __init__(self, uri, name, artists=(), album=None, duration_ms=None, added_at=None):
+        self.uri = uri
+        self.name = name
+        self.artists = tuple(intern(artist) for artist in artists)
+        self.album = intern(album)
+        self.duration_ms = duration_ms
+        self.added_at = added_at
+
+    @classmethod
+    def from_track_info(cls, track_info, added_at=None):
+        return cls(
+            track_info.get('uri'),
+            track_info.get('name'),
+            [artist.get('name') for artist in track_info.get('artists') or ()],
+            (track_info.get('album') or {}).get('name'),
+            track_info.get('duration_ms'),
+            added_at,
+        )
+
+    @classmethod
+    def from_playlist_item(cls, item):
+        track_info = item.get('track')
+        if not track_info:
+            return cls(None, None, added_at=item.get('added_at'))
+        return cls.from_track_info(track_info, item.get('added_at'))
+
+    def __repr__(self):
+        return 'SpotifyTrack({!r}, {!r}, {!r}, {!r})'.format(self.uri, self.name, self.artists, self.album)
@@ -0,0 +1,118 @@
+import re
+from difflib import SequenceMatcher
+
+from .instrumentation import metrics
+
+
+def similarity(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+NUMBER_PATTERN = re.compile(r"\d+")
+
+
+class CandidateScorer(object):
+    """
+    Picks the spotify track among a page of search results that best matches a local track. Each
+    candidate is normalized once and scored in a single pass: a candidate the exact matcher accepts
+    wins outright, otherwise the best candidate whose weighted title, artist, album & duration
+    similarity reaches `threshold` does.
+
+    Titles a letter or a number apart are often different tracks ("Part 1" & "Part 2", "Intro" &
+    "Outro"), so only candidates whose title is at least `TITLE_THRESHOLD` similar, and has the same
+    numbers in it, are scored at all. Looser searches find more tracks that aren't the one searched
+    for, so `strict` matching only scores candidates with exactly the track's title.
+    """
+    WEIGHTS = {
+        'title': 0.45,
+        'artist': 0.3,
+        'album': 0.15,
+        'duration': 0.1,
+    }
+    # Durations this far apart (or further) don't count towards the score at all
+    DURATION_TOLERANCE_MS = 10000
+    # How similar a candidate's title must be to be scored at all
+    TITLE_THRESHOLD = 0.9
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+
+    def best_match(self, track, spotify_tracks, strict=False):
+        """
+        Returns the best matching SpotifyTrack and its score, or None and the best score when no
+        candidate is good enough
+        """
+        title_threshold = 1.0 if strict else self.TITLE_THRESHOLD
+        best_spotify_track = None
+        best_score = 0.0
+        compared = 0
+        try:
+            for spotify_track in spotify_tracks:
+                compared += 1
+                spotify_forms = track.normalize_spotify_track(spotify_track)
+                if track.matches_spotify_forms(spotify_forms):
+                    return spotify_track, 1.0
+
+                score = self.score(track, spotify_forms, spotify_track.duration_ms, title_threshold)
+                if score > best_score:
+                    best_spotify_track, best_score = spotify_track, score
+        finally:
+            metrics.increment('matcher.comparisons', compared)
+
+        if best_spotify_track is not None and best_score >= self.threshold:
+            return best_spotify_track, best_score
+        return None, best_score
+
+    def score(self, track, spotify_forms, duration_ms=None, title_threshold=None):
+        """
+        The weighted similarity, from 0 to 1, of the track to a spotify track's forms, or 0 if their
+        titles are less similar than `title_threshold` (TITLE_THRESHOLD by default). What the local
+        track doesn't know (its artist, album or duration) is left out of the score.
+        """
+        forms = track.forms
+        title_similarity = self._title_similarity(forms, spotify_forms)
+        if title_similarity < (self.TITLE_THRESHOLD if title_threshold is None else title_threshold):
+            return 0.0
+
+        scores = [(self.WEIGHTS['title'], title_similarity)]
+        if forms.artist:
+            scores.append((self.WEIGHTS['artist'], self._artist_similarity(forms, spotify_forms)))
+        if forms.album:
+            scores.append((self.WEIGHTS['album'], self._album_similarity(track, spotify_forms)))
+        if track.duration_ms and duration_ms:
+            scores.append((self.WEIGHTS['duration'], self._duration_similarity(track.duration_ms, duration_ms)))
+
+        return sum(weight * score for weight, score in scores) / sum(weight for weight, score in scores)
+
+    def _title_similarity(self, forms, spotify_forms):
+        return max((
+            similarity(candidate, spotify_title)
+            for candidate in forms.title_candidates
+            for spotify_title in (spotify_forms.title, spotify_forms.title_base)
+            if NUMBER_PATTERN.findall(candidate) == NUMBER_PATTERN.findall(spotify_title)
+        ), default=0.0)
+
+    def _artist_similarity(self, forms, spotify_forms):
+        if forms.artist in spotify_forms.artist_names:
+            return 1.0
+        return max(
+            similarity(forms.artist, name)
+            for name in spotify_forms.artist_names | {spotify_forms.artists_joined}
+        )
+
+    def _album_similarity(self, track, spotify_forms):
+        if track._album_matches(spotify_forms):
+            return 1.0
+        forms = track.forms
+        return max(
+            similarity(forms.album, spotify_forms.album),
+            similarity(forms.album_base, spotify_forms.album_base),
+        )
+
+    def _duration_similarity(self, local_duration_ms, spotify_duration_ms):
+        difference = abs(int(local_duration_ms) - int(spotify_duration_ms))
+        return max(0.0, 1.0 - float(difference) / self.DURATION_TOLERANCE_MS)
@@ -1,14 +1,81 @@
+import json
 import logging
+import threading
+import time
 import urllib
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
-import dateutil
+import dateutil.parser
+import requests
 import spotipy
+from spotipy import SpotifyException
 from spotipy import util as spotipy_util
 
+from . import logcontext
+from .instrumentation import metrics
+from .normalize import LRUCache
+from .ratelimit import RequestScheduler
+from .records import SpotifyTrack
+from .scoring import CandidateScorer
+
 logger = logging.getLogger(__name__)
 
 
+class SpotifyClient(spotipy.Spotify):
+    """
+    A spotipy client that sends every request through a RequestScheduler, and keeps the
+    scheduler's pooled connections alive rather than closing them after each response. Only GET
+    requests are idempotent, the playlist edits are positional.
+    """
+    # Seconds to wait for spotify to respond, rather than hanging forever on a stalled connection
+    REQUESTS_TIMEOUT = 30
+
+    def __init__(self, scheduler, **kwargs):
+        kwargs.setdefault('requests_timeout', self.REQUESTS_TIMEOUT)
+        super(SpotifyClient, self).__init__(requests_session=scheduler.session, **kwargs)
+        self.scheduler = scheduler
+
+    def _internal_call(self, method, url, payload, params):
+        return self.scheduler.call(self._request, method, url, payload, params, idempotent=method == 'GET')
+
+    def _request(self, method, url, payload, params):
+        args = dict(params=params, timeout=self.requests_timeout)
+        if not url.startswith('http'):
+            url = self.prefix + url
+        headers = self._auth_headers()
+        headers['Content-Type'] = 'application/json'
+
+        if payload:
+            args['data'] = json.dumps(payload)
+
+        response = self._session.request(method, url, headers=headers, proxies=self.proxies, **args)
+
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            try:
+                message = response.json()['error']['message']
+            except (ValueError, KeyError, TypeError):
+                message = 'error'
+            raise SpotifyException(
+                response.status_code,
+                -1,
+                '{}:\n {}'.format(response.url, message),
+                headers=response.headers,
+            )
+
+        if response.text and response.text != 'null':
+            return response.json()
+        return None
+
+    def _get(self, url, args=None, payload=None, **kwargs):
+        # Retrying is the scheduler's job, skip spotipy's own retry loop
+        if args:
+            kwargs.update(args)
+        return self._internal_call('GET', url, payload, kwargs)
+
+
 class Spotify(object):
     _client = None
     _playlists = None
@@ -18,26 +85,59 @@ class Spotify(object):
         'playlist-modify-private',
         'user-read-private'
     ])
+    # Only the parts of a playlist item that track matching & the latest addition date rely on
+    PLAYLIST_TRACK_FIELDS = 'items(added_at,track(uri,name,artists(name),album(name))),next'
+    # The most tracks the API will accept in a single add request
+    ADD_TRACKS_CHUNK_SIZE = 100
+    # How many times to retry adding a chunk of tracks that failed
+    ADD_TRACKS_RETRIES = 1
+    # How many search results to remember during a run
+    SEARCH_MEMO_SIZE = 10000
+    # Returned by find_track for a track whose search failed, rather than found nothing
+    SEARCH_FAILED = object()
+    REDIRECT_URI = 'http://example.com/tunezinc/'
 
-    def __init__(self, username, client_id, client_secret, create_public=False):
+    def __init__(self, username, client_id, client_secret, create_public=False, search_workers=1,
+                 scheduler=None, scorer=None, searches=None, catalog=None, token_store=None):
         self.username = username
         self.client_id = client_id
         self.client_secret = client_secret
         self.create_public = create_public
+        self.search_workers = max(1, search_workers)
+        self.scheduler = scheduler or RequestScheduler(pool_size=self.search_workers)
+        self.scorer = scorer or CandidateScorer()
+        # Can be shared by the clients of several accounts
+        self._searches = searches if searches is not None else LRUCache(maxsize=self.SEARCH_MEMO_SIZE)
+        # Where the tracks found by searches are catalogued, if anywhere
+        self.catalog = catalog
+        self.token_store = token_store
+        self._client_lock = threading.Lock()
+        self._playlists_lock = threading.RLock()
 
     def _get_auth(self):
         return spotipy_util.prompt_for_user_token(
             username=self.username,
             client_id=self.client_id,
             client_secret=self.client_secret,
-            redirect_uri='http://example.com/tunezinc/',
+            redirect_uri=self.REDIRECT_URI,
             scope=self.SCOPES,
         )
 
     @property
     def client(self):
-        if not self._client:
-            self._client = spotipy.Spotify(auth=self._get_auth())
+        """
+        The spotipy client. With a token store, its token is looked up (and kept fresh in the
+        background) by the store, which only prompts here, before the first request, when it has no
+        token at all. Without one, the user is prompted for a token unless spotipy has one cached.
+        """
+        with self._client_lock:
+            if not self._client:
+                if self.token_store is not None:
+                    self.token_store.authorize(self.REDIRECT_URI)
+                    self.token_store.start()
+                    self._client = SpotifyClient(self.scheduler, client_credentials_manager=self.token_store)
+                else:
+                    self._client = SpotifyClient(self.scheduler, auth=self._get_auth())
         return self._client
 
     def search(self, q, market=None, limit=10, offset=0, type='track'):
@@ -50,9 +150,19 @@ class Spotify(object):
 
         return self.client._get('search', q=q, market=market, limit=limit, offset=offset, type=type)
 
+    def _paginate(self, page):
+        """
+        Yields the items of a paged result, only fetching each following page once the previous
+        page's items have been consumed
+        """
+        while page:
+            for item in page['items']:
+                yield item
+            page = self.client.next(page) if page.get('next') else None
+
     def _fetch_playlists(self):
         playlists = {}
-        for playlist in self.client.user_playlists(self.username)['items']:
+        for playlist in self._paginate(self.client.user_playlists(self.username)):
             if playlist['owner']['id'] != self.username:
                 logger.debug("Skipping playlist owned by a different user, {} ".format(playlist['name']))
                 continue
@@ -67,30 +177,56 @@ class Spotify(object):
 
     @property
     def playlists(self):
-        if not self._playlists:
-            self._playlists = self._fetch_playlists()
+        with self._playlists_lock:
+            if self._playlists is None:
+                self._playlists = self._fetch_playlists()
         return self._playlists
 
     def _create_playlist(self, name):
-        playlist = self.client.user_playlist_create(self.username, name)
-        logger.info("Playlist named '{}' created.".format(name))
-        self._playlists[name] = playlist
+        with self._playlists_lock:
+            playlist = self.client.user_playlist_create(self.username, name)
+            logger.info("Playlist named '{}' created.".format(name))
+            self._playlists[name] = playlist
         return playlist
 
     def get_playlist(self, name):
         return self.playlists[name]
 
-    def get_playlist_tracks(self, playlist_uri):
-        return self.client.user_playlist_tracks(self.username, playlist_uri)
+    def refresh(self):
+        """
+        Forgets the listed playlists and the searches made so far, and recreates the client (with a
+        fresh auth token when there's no token store to keep it fresh), for a long running process
+        to see what changed since
+        """
+        with self._playlists_lock:
+            self._playlists = None
+        self._searches.clear()
+        with self._client_lock:
+            self._client = None
 
-    def get_latest_addition_date(self, playlist_tracks):
-        max_added_at = None
-        items = playlist_tracks.get('items')
-        if not items:
-            return None
+    def close(self):
+        """
+        Stops refreshing the token in the background
+        """
+        if self.token_store is not None:
+            self.token_store.stop()
 
+    def get_playlist_tracks(self, playlist_uri):
+        """
+        Yields a SpotifyTrack for each item of the playlist, parsing each page as it's fetched
+        """
+        items = self._paginate(self.client.user_playlist_tracks(
+            self.username,
+            playlist_uri,
+            fields=self.PLAYLIST_TRACK_FIELDS,
+        ))
         for item in items:
-            added_at = item.get('added_at')
+            yield SpotifyTrack.from_playlist_item(item)
+
+    def get_latest_addition_date(self, playlist_items):
+        max_added_at = None
+        for item in playlist_items:
+            added_at = item.added_at
             if not added_at:
                 continue
             if not max_added_at or max_added_at < added_at:
@@ -101,43 +237,190 @@ class Spotify(object):
         return None
 
     def get_or_create_playlist(self, name):
+        with self._playlists_lock:
+            try:
+                return self.get_playlist(name)
+            except KeyError:
+                logger.info("Playlist named '{}' doesn't exist".format(name))
+                return self._create_playlist(name)
+
+    def _search_queries(self, track):
+        """
+        The queries to search for the track with, from the strictest to the loosest: by title, artist
+        & album, then without the album, then as free text
+        """
+        queries = [
+            u'track:"{}" artist:"{}" album:"{}"'.format(track.search_title, track.artist, track.search_album),
+            u'track:"{}" artist:"{}"'.format(track.search_title, track.artist),
+            u' '.join(term for term in (track.search_title, track.artist) if term),
+        ]
+        if not track.album:
+            # Without an album the first two queries are the same
+            del queries[0]
+        return queries
+
+    def search_tracks(self, query):
+        """
+        Returns the SpotifyTracks found for the query. Identical queries made during the run, like
+        those for the same track on several playlists, share a single request and its result.
+        """
+        future = Future()
+        searched = self._searches.setdefault(query, future)
+        if searched is not future:
+            metrics.increment('spotify.searches_coalesced')
+            return searched.result()
+
+        metrics.increment('spotify.searches')
         try:
-            return self.get_playlist(name)
-        except KeyError:
-            logger.info("Playlist named '{}' doesn't exist".format(name))
-            return self._create_playlist(name)
+            results = self.search(q=query, type='track', market='from_token')
+            items = [
+                SpotifyTrack.from_track_info(track_info)
+                for track_info in results.get('tracks', {}).get('items') or []
+            ]
+        except BaseException as e:
+            # Don't remember failures, a later search for the same query should try again. The memo
+            # may have been cleared, and the query searched again, in the meantime. Whatever
+            # failed, those waiting on the same search mustn't wait forever.
+            self._searches.discard(query, future)
+            future.set_exception(e)
+            raise
+        future.set_result(items)
+
+        if self.catalog is not None:
+            try:
+                self.catalog.add(items)
+            except Exception:
+                logger.exception("Failed to catalog the results of searching {}".format(query))
+        return items
 
     def find_track(self, track):
-        logger.debug("Searching for spotify track matching: {}".format(track))
-        parts = [
-            u'track:"{}"'.format(track.search_title),
-            u'artist:"{}"'.format(track.artist),
-            u'album:"{}"'.format(track.search_album),
-        ]
+        """
+        Returns the track with the uri of its spotify match, None if it has none, or SEARCH_FAILED if
+        it couldn't be searched for, so one failing search doesn't fail every other track's
+        """
+        with metrics.phase('search'):
+            logger.debug("Searching for spotify track matching: {}".format(track))
 
-        results = self.search(
-            q=u' '.join(parts),
-            type='track',
-            market='from_token'
-        )
+            best_score = None
+            for number, query in enumerate(self._search_queries(track)):
+                try:
+                    items = self.search_tracks(query)
+                except (SpotifyException, requests.RequestException) as e:
+                    logger.error("Failed to search for {}: {}".format(track, e))
+                    metrics.increment('spotify.searches_failed')
+                    return self.SEARCH_FAILED
+                if not items:
+                    continue
 
-        items = results.get('tracks', {}).get('items')
-        if not items:
-            logger.info("No match found for {}".format(track))
+                # The fallback queries turn up more tracks that aren't this one, only take their
+                # results with exactly its title
+                spotify_track, score = self.scorer.best_match(track, items, strict=number > 0)
+                if spotify_track is not None:
+                    track.spotify_uri = spotify_track.uri
+                    logger.debug("Match found (score {:.2f}) searching {}: {}, {}".format(
+                        score, query, track, spotify_track))
+                    return track
+                best_score = max(score, best_score or 0)
+
+            if best_score is None:
+                logger.info("No match found for {}".format(track))
+            else:
+                logger.info("No match found for {} (best score {:.2f})".format(track, best_score))
             return None
 
-        for track_info in items:
-            if track.matches_spotify_track_info(track_info):
-                track.spotify_uri = track_info.get('uri')
-                logger.debug("Match found: {}, {}".format(track, track_info))
-                return track
+    def find_tracks(self, tracks):
+        """
+        Yields the result of find_track for each of the tracks, in the order they were given, with
+        up to `search_workers` searches in flight at once
+        """
+        if self.search_workers == 1:
+            for track in tracks:
+                yield self.find_track(track)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.search_workers) as executor:
+            for found_track in executor.map(logcontext.bind(self.find_track), tracks):
+                yield found_track
+
+    def _chunk_tracks(self, tracks):
+        chunk = []
+        for track in tracks:
+            if not track or not track.spotify_uri:
+                continue
+
+            chunk.append(track)
+            if len(chunk) == self.ADD_TRACKS_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def _add_track_uris(self, playlist, uris):
+        try:
+            with metrics.phase('add'):
+                result = self.client.user_playlist_add_tracks(self.username, playlist['uri'], uris)
+        except (SpotifyException, requests.RequestException) as e:
+            logger.error("Failed to add {} track(s) to '{}': {}".format(len(uris), playlist['name'], e))
+            return False
+
+        if result and result.get('snapshot_id'):
+            playlist['snapshot_id'] = result['snapshot_id']
+        return True
 
     def add_tracks_to_playlist(self, playlist, tracks):
-        if not tracks:
-            return 0
+        """
+        Adds the resolved tracks to the playlist in chunks of up to ADD_TRACKS_CHUNK_SIZE, skipping
+        those without a spotify uri. Each chunk is added as soon as it fills up, so `tracks` can be
+        a generator of tracks still being resolved. A chunk that fails is retried up to
+        ADD_TRACKS_RETRIES times, after the scheduler's backoff, before moving on to the next, so
+        the tracks stay in order. One that still fails is skipped rather than aborting the others.
+        Returns the tracks that were added.
+        """
+        added_tracks = []
+        for chunk in self._chunk_tracks(tracks):
+            uris = [track.spotify_uri for track in chunk]
+            attempt = 0
+            while not self._add_track_uris(playlist, uris):
+                if attempt >= self.ADD_TRACKS_RETRIES:
+                    break
+                time.sleep(self.scheduler.backoff(attempt))
+                attempt += 1
+            else:
+                added_tracks.extend(chunk)
 
-        result = self.client.user_playlist_add_tracks(
-            self.username,
-            playlist['uri'],
-            [track.spotify_uri for track in tracks],
+        return added_tracks
+
+    def _edit_playlist(self, playlist, operation):
+        action = operation[0]
+        if action == 'remove':
+            return self.client.user_playlist_remove_specific_occurrences_of_tracks(
+                self.username, playlist['uri'], operation[1], snapshot_id=playlist.get('snapshot_id'),
+            )
+        if action == 'add':
+            return self.client.user_playlist_add_tracks(
+                self.username, playlist['uri'], operation[1], position=operation[2],
+            )
+        range_start, range_length, insert_before = operation[1:]
+        return self.client.user_playlist_reorder_tracks(
+            self.username, playlist['uri'], range_start, insert_before,
+            range_length=range_length, snapshot_id=playlist.get('snapshot_id'),
         )
+
+    def edit_playlist(self, playlist, operations):
+        """
+        Carries out the operations of a reconcile.edit_script on the playlist, in order, pinning
+        each removal & reorder to the snapshot the one before it left. Stops at the first one that
+        fails, since the positions of those after it assume it was made. Returns whether they all were.
+        """
+        for operation in operations:
+            try:
+                with metrics.phase('edit'):
+                    result = self._edit_playlist(playlist, operation)
+            except (SpotifyException, requests.RequestException) as e:
+                logger.error("Failed to {} tracks of '{}': {}".format(operation[0], playlist['name'], e))
+                return False
+
+            if result and result.get('snapshot_id'):
+                playlist['snapshot_id'] = result['snapshot_id']
+        return True
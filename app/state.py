@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SyncState(object):
+    """
+    What was synced for each gmusic playlist by previous runs: the playlist's lastModifiedTimestamp
+    as of the last sync, the id of the spotify playlist it was synced to, and the spotify uri each
+    of its entries was synced as (None for entries that couldn't be synced yet), persisted as JSON.
+    Spotify playlists' last seen snapshot is persisted alongside, so they needn't be downloaded
+    again while it's unchanged, as is the lastModifiedTimestamp of each gmusic playlist as of the
+    last time a sync looked at it, even if there was nothing to sync.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._playlists = {}
+        self._snapshots = {}
+        self._seen = {}
+
+        if os.path.isfile(path):
+            try:
+                with open(path) as state_file:
+                    state = json.load(state_file)
+                self._playlists = state.get('playlists', {})
+                self._snapshots = state.get('spotify_playlists', {})
+                self._seen = state.get('seen', {})
+            except ValueError:
+                logger.warning("Ignoring unreadable sync state in {}".format(path))
+
+    def get(self, playlist_id):
+        """
+        Returns the playlist's state, a dict with `last_modified`, `spotify_playlist_id` (None in state
+        saved before it was recorded) & `entries`, or None if it hasn't been synced before
+        """
+        with self._lock:
+            return self._playlists.get(playlist_id)
+
+    def set(self, playlist_id, last_modified, entries, spotify_playlist_id=None):
+        with self._lock:
+            self._playlists[playlist_id] = {
+                'last_modified': last_modified,
+                'spotify_playlist_id': spotify_playlist_id,
+                'entries': entries,
+            }
+            self._seen[playlist_id] = last_modified
+
+    def last_seen(self, playlist_id):
+        """
+        Returns the playlist's lastModifiedTimestamp as of the last time it was synced or found to
+        have nothing to sync, or None
+        """
+        with self._lock:
+            if playlist_id in self._seen:
+                return self._seen[playlist_id]
+            # State saved before the playlists seen were recorded
+            playlist_state = self._playlists.get(playlist_id)
+            return playlist_state['last_modified'] if playlist_state else None
+
+    def see(self, playlist_id, last_modified):
+        """
+        Records that the playlist had nothing to sync as of its lastModifiedTimestamp
+        """
+        with self._lock:
+            self._seen[playlist_id] = last_modified
+
+    def get_snapshot(self, spotify_playlist_id):
+        """
+        Returns what was last seen of the spotify playlist, a dict with `snapshot_id`, `count` (of its
+        tracks) & `latest_addition` (an ISO date), or None
+        """
+        with self._lock:
+            return self._snapshots.get(spotify_playlist_id)
+
+    def set_snapshot(self, spotify_playlist_id, snapshot_id, count, latest_addition):
+        with self._lock:
+            self._snapshots[spotify_playlist_id] = {
+                'snapshot_id': snapshot_id,
+                'count': count,
+                'latest_addition': latest_addition,
+            }
+
+    def forget(self, playlist_id=None):
+        """
+        Forgets the state of a playlist, or of every playlist (and spotify playlist snapshot),
+        forcing them to be fully synced
+        """
+        with self._lock:
+            if playlist_id:
+                self._playlists.pop(playlist_id, None)
+                self._seen.pop(playlist_id, None)
+            else:
+                self._playlists.clear()
+                self._snapshots.clear()
+                self._seen.clear()
+
+    def save(self):
+        with self._lock:
+            temp_path = '{}.tmp'.format(self.path)
+            with open(temp_path, 'w') as state_file:
+                json.dump({
+                    'playlists': self._playlists,
+                    'spotify_playlists': self._snapshots,
+                    'seen': self._seen,
+                }, state_file)
+            os.replace(temp_path, self.path)
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import threading
+import time
+import webbrowser
+
+import requests
+from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+
+from .instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore(object):
+    """
+    A spotify user's access token, persisted across runs (in spotipy's token cache format) and
+    refreshed on a background thread `refresh_margin` seconds before it expires. Runs reuse the
+    token while it's valid rather than logging in again, and long runs never find it expired.
+
+    It's the spotipy client's client_credentials_manager, so get_access_token is on the path of
+    every request: it never prompts, and only refreshes the token itself if the background refresh
+    failed to before it expired. Only `authorize`, when there's no token to refresh at all, prompts.
+    """
+    TOKEN_URL = 'https://accounts.spotify.com/api/token'
+    # How long to wait before trying a failed refresh again
+    RETRY_INTERVAL = 30
+
+    def __init__(self, path, client_id, client_secret, scope=None, token_url=None, refresh_margin=300,
+                 session=None):
+        self.path = path
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.token_url = token_url or self.TOKEN_URL
+        self.refresh_margin = refresh_margin
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._token_info = self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path) as token_file:
+                token_info = json.load(token_file)
+        except ValueError:
+            logger.warning("Ignoring unreadable spotify token in {}".format(self.path))
+            return None
+
+        if self.scope and not set(self.scope.split()) <= set((token_info.get('scope') or '').split()):
+            logger.info("Stored spotify token doesn't cover every scope needed, ignoring it")
+            return None
+        if not token_info.get('refresh_token'):
+            return None
+        return token_info
+
+    def _save(self, token_info):
+        # Only readable by the user, and replaced at once so a crash can't leave half a token
+        temporary_path = '{}.tmp'.format(self.path)
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as token_file:
+            json.dump(token_info, token_file)
+        os.replace(temporary_path, self.path)
+
+    def _set_token_info(self, token_info):
+        token_info['expires_at'] = int(time.time()) + int(token_info['expires_in'])
+        if self.scope and not token_info.get('scope'):
+            token_info['scope'] = self.scope
+        with self._lock:
+            if not token_info.get('refresh_token') and self._token_info:
+                token_info['refresh_token'] = self._token_info['refresh_token']
+            self._token_info = token_info
+        self._save(token_info)
+
+    @property
+    def expires_in(self):
+        """
+        Seconds until the access token expires, or None if there's no token
+        """
+        with self._lock:
+            token_info = self._token_info
+        return token_info['expires_at'] - time.time() if token_info else None
+
+    def authorize(self, redirect_uri):
+        """
+        Logs in interactively, in the browser, if there's no stored token to refresh
+        """
+        if self._token_info is not None:
+            return
+
+        oauth = SpotifyOAuth(self.client_id, self.client_secret, redirect_uri, scope=self.scope)
+        oauth.OAUTH_TOKEN_URL = self.token_url
+        auth_url = oauth.get_authorize_url()
+        print("Authorize TuneZinc to access your spotify account, then paste the URL you're redirected to.")
+        try:
+            webbrowser.open(auth_url)
+            print("Opened {} in your browser".format(auth_url))
+        except webbrowser.Error:
+            print("Please navigate here: {}".format(auth_url))
+
+        code = oauth.parse_response_code(input("Enter the URL you were redirected to: "))
+        token_info = oauth.get_access_token(code)
+        self._set_token_info(token_info)
+
+    def get_access_token(self):
+        expires_in = self.expires_in
+        if expires_in is None:
+            raise SpotifyOauthError("No spotify token stored in {}, authorize first".format(self.path))
+        if expires_in <= 0:
+            self.refresh(0)
+        with self._lock:
+            return self._token_info['access_token']
+
+    def refresh(self, min_expires_in=None):
+        """
+        Refreshes the access token unless it's valid for more than `min_expires_in` seconds, as when
+        another thread just refreshed it
+        """
+        with self._refresh_lock:
+            if min_expires_in is not None and self.expires_in > min_expires_in:
+                return
+
+            with self._lock:
+                refresh_token = self._token_info['refresh_token']
+            response = self.session.post(
+                self.token_url,
+                data={'grant_type': 'refresh_token', 'refresh_token': refresh_token},
+                auth=(self.client_id, self.client_secret),
+                timeout=30,
+            )
+            if response.status_code != 200:
+                raise SpotifyOauthError("Couldn't refresh the spotify token: {} {}".format(
+                    response.status_code, response.reason))
+
+            self._set_token_info(response.json())
+            metrics.increment('spotify.token_refreshes')
+            logger.debug("Refreshed the spotify token")
+
+    def start(self):
+        """
+        Starts refreshing the token in the background, unless it already is
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='spotify-token-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                lifetime = self._token_info.get('expires_in') or 0
+            # Refresh tokens that don't live much longer than the margin half way through
+            margin = min(self.refresh_margin, lifetime / 2.0)
+            wait = self.expires_in - margin
+            if wait > 0:
+                self._stopped.wait(wait)
+                continue
+
+            try:
+                self.refresh(margin)
+            except (SpotifyOauthError, requests.RequestException, ValueError, KeyError) as e:
+                logger.warning("Failed to refresh the spotify token, trying again in {}s: {}".format(
+                    self.RETRY_INTERVAL, e))
+                self._stopped.wait(self.RETRY_INTERVAL)
@@ -1,14 +1,35 @@
 import logging
 import re
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
+import dateutil.parser
+import pytz
+from cached_property import cached_property
+
+from .cache import MatchCache, TrackInfoCache
+from .catalog import CatalogIndex
 from .gmusic import Gmusic
+from .instrumentation import metrics
+from . import logcontext
+from .logcontext import playlist_context
+from .matching import find_in_index
+from .normalize import LRUCache, SpotifyTrackForms, TrackForms, clean_term
+from .ratelimit import RequestScheduler
+from .reconcile import edit_script, target_uris, tracks_touched
+from .scoring import CandidateScorer
 from .spotify import Spotify
+from .state import SyncState
+from .tokens import TokenStore
 
 logger = logging.getLogger(__name__)
 
 
 class Track(object):
     spotify_uri = None
+    SPOTIFY_FORMS_CACHE_SIZE = 50000
     FEATURING_PATTERN = re.compile(r"""
         ^(?P<title>.*?)         # Some title
         \s+                     # Required whitespace break
@@ -53,31 +74,174 @@ class Track(object):
         $
     """, re.VERBOSE | re.IGNORECASE)
 
-    def __init__(self, title=u'', artist=u'', album=u''):
+    # A trailing " - Remastered 2011" or "(Mono)" spotify adds to a track's name, that's still the
+    # same recording. Live, remixed, instrumental etc. versions are different tracks, so aren't stripped.
+    SUFFIX_PATTERN = re.compile(r"""
+        \s+(?:-\s+|[(\[])         # A dash, or an opening parens or bracket
+        (?=[^)\]]*\b(?:remaster(?:ed)?|mono|stereo|explicit)\b)    # Naming the same recording
+        (?![^)\]]*\b(?:                                           # And not a different one
+            live|(?:re)?mix|instrumental|acoustic|demo|edit|karaoke|session|
+            (?<!remastered\s)(?<!remaster\s)version
+        )\b)
+        [^)\]]*[)\]]?             # The suffix, through its closing parens or bracket
+        $
+    """, re.VERBOSE | re.IGNORECASE)
+
+    _spotify_forms_cache = LRUCache(maxsize=SPOTIFY_FORMS_CACHE_SIZE)
+
+    def __init__(self, title=u'', artist=u'', album=u'', gmusic_id=None, duration_ms=None):
         self.title = title
         self.artist = artist
         self.album = album
+        self.gmusic_id = gmusic_id
+        self.duration_ms = duration_ms
 
     @classmethod
-    def from_gmusic_track_info(cls, track_info):
-        return cls(**{key: track_info.get(key, '') for key in ('title', 'artist', 'album')})
+    def from_gmusic_track(cls, gmusic_track):
+        return cls(
+            gmusic_track.title,
+            gmusic_track.artist,
+            gmusic_track.album,
+            gmusic_id=gmusic_track.id,
+            duration_ms=gmusic_track.duration_ms,
+        )
+
+    @property
+    def cache_key(self):
+        """
+        Identifies the track across runs, by its gmusic id when it has one
+        """
+        if self.gmusic_id:
+            return u'gmusic:{}'.format(self.gmusic_id)
+        forms = self.forms
+        return u'track:{}\x1f{}\x1f{}'.format(forms.title, forms.artist, forms.album)
+
+    @cached_property
+    def forms(self):
+        local_title = self._clean_term(self.title)
+        featuring = None
+        featuring_title = None
+        title_base = local_title
 
-    def matches_spotify_track_info(self, track_info):
+        featuring_match = self.FEATURING_PATTERN.search(local_title)
+        if featuring_match:
+            featuring = tuple(
+                self._clean_term(featuring_artist)
+                for featuring_artist in re.split(r",| and ", featuring_match.group('featuring').lower())
+            )
+            featuring_title = "{title} - feat. {featuring}".format(**featuring_match.groupdict())
+
+            feature_title = featuring_match.group('title')
+            feature_suffix = featuring_match.group('suffix')
+            title_base = "{}{}".format(
+                feature_title.strip(),
+                " {}".format(feature_suffix.strip()) if feature_suffix else ''
+            )
+
+        title_variants = set()
+        for pattern, group in ((self.VERSION_PATTERN, 'version'), (self.EDITION_PATTERN, 'edition')):
+            match = pattern.search(title_base)
+            if match:
+                title_variants.add("{} - {}".format(match.group('title'), match.group(group)))
+                title_variants.add("{} {}".format(match.group('title'), match.group(group)))
+
+        title_candidates = {local_title, title_base} | title_variants
+        if featuring_title:
+            title_candidates.add(featuring_title)
+
+        local_album = self._clean_term(self.album)
+        album_variants = frozenset()
+        album_base = local_album
+        album_edition_match = self.EDITION_PATTERN.search(local_album)
+        if album_edition_match:
+            album_variants = frozenset([
+                "{title} - {edition}".format(**album_edition_match.groupdict()),
+                "{title} {edition}".format(**album_edition_match.groupdict()),
+            ])
+            album_base = album_edition_match.group('title')
+
+        return TrackForms(
+            title=local_title,
+            featuring=featuring,
+            featuring_title=featuring_title,
+            title_base=title_base,
+            title_variants=frozenset(title_variants),
+            title_candidates=frozenset(title_candidates),
+            artist=self._clean_term(self.artist),
+            album=local_album,
+            album_variants=album_variants,
+            album_base=album_base,
+            album_has_edition=bool(album_edition_match),
+            search_title=self._search_title(),
+            search_album=self._search_album(),
+        )
+
+    @classmethod
+    def normalize_spotify_track(cls, spotify_track):
+        """
+        A spotify track is compared against every local track, so its canonical forms are memoized
+        by uri (falling back to its raw names when it doesn't have one)
+        """
+        key = spotify_track.uri or (spotify_track.name, spotify_track.album, spotify_track.artists)
+        spotify_forms = cls._spotify_forms_cache.get(key)
+        if spotify_forms is None:
+            metrics.cache_lookup('spotify_forms', misses=1)
+            spotify_forms = cls._normalize_spotify_track(spotify_track)
+            cls._spotify_forms_cache.set(key, spotify_forms)
+        else:
+            metrics.cache_lookup('spotify_forms', hits=1)
+        return spotify_forms
+
+    @classmethod
+    def _normalize_spotify_track(cls, spotify_track):
+        artist_names = [cls._clean_term(artist) for artist in spotify_track.artists]
+        track_info_album = cls._clean_term(spotify_track.album or u'')
+
+        album_dash = None
+        album_base = track_info_album
+        album_edition_match = cls.EDITION_PATTERN.search(track_info_album)
+        if album_edition_match:
+            album_dash = "{title} - {edition}".format(**album_edition_match.groupdict())
+            album_base = album_edition_match.group('title')
+
+        title = cls._clean_term(spotify_track.name)
+        return SpotifyTrackForms(
+            title=title,
+            title_base=cls.SUFFIX_PATTERN.sub('', title),
+            artist_names=frozenset(artist_names),
+            artists_joined=u' and '.join(artist_names).lower(),
+            album=track_info_album,
+            album_dash=album_dash,
+            album_base=album_base,
+            album_has_edition=bool(album_edition_match),
+        )
+
+    def matches_spotify_track(self, spotify_track):
+        return self.matches_spotify_forms(self.normalize_spotify_track(spotify_track))
+
+    def matches_spotify_forms(self, spotify_forms):
         return (
-            self._title_matches(track_info) and
-            self._artist_matches(track_info) and
-            self._album_matches(track_info)
+            self._title_matches(spotify_forms) and
+            self._artist_matches(spotify_forms) and
+            self._album_matches(spotify_forms)
         )
 
-    def _artist_matches(self, track_info):
-        local_artist = self._clean_term(self.artist)
+    def _artist_matches(self, spotify_forms):
+        local_artist = self.forms.artist
         if not local_artist:
             return True
 
-        return (local_artist.lower() in self._track_info_artist_names(track_info))
+        return local_artist in spotify_forms.artist_names
 
     @property
     def search_title(self):
+        return self.forms.search_title
+
+    @property
+    def search_album(self):
+        return self.forms.search_album
+
+    def _search_title(self):
         title = self.title
 
         featuring_match = self.FEATURING_PATTERN.search(title)
@@ -94,8 +258,7 @@ class Track(object):
 
         return title
 
-    @property
-    def search_album(self):
+    def _search_album(self):
         album = self.album
         album_edition_match = self.EDITION_PATTERN.search(album)
         if album_edition_match:
@@ -114,12 +277,14 @@ class Track(object):
 
         return album
 
-    def _clean_term(self, term):
-        return term.replace("&", "and").strip().lower()
+    @staticmethod
+    def _clean_term(term):
+        return clean_term(term)
 
-    def _album_matches(self, track_info):
-        local_album = self._clean_term(self.album)
-        track_info_album = self._clean_term(track_info.get('album', {}).get('name'))
+    def _album_matches(self, spotify_forms):
+        forms = self.forms
+        local_album = forms.album
+        track_info_album = spotify_forms.album
 
         if not local_album:
             return True
@@ -127,105 +292,51 @@ class Track(object):
         if local_album == track_info_album:
             return True
 
-        local_album_edition_match = self.EDITION_PATTERN.search(local_album)
-        track_info_album_edition_match = self.EDITION_PATTERN.search(track_info_album)
-
-        if not local_album_edition_match and not track_info_album_edition_match:
+        if not forms.album_has_edition and not spotify_forms.album_has_edition:
             return False
 
-        if local_album_edition_match:
-            if "{title} - {edition}".format(
-                    **local_album_edition_match.groupdict()) == track_info_album:
-                return True
-
-            if "{title} {edition}".format(
-                    **local_album_edition_match.groupdict()) == track_info_album:
+        if forms.album_has_edition:
+            if track_info_album in forms.album_variants:
                 return True
 
-            if not track_info_album_edition_match:
-                if local_album_edition_match.group('title') == track_info_album:
+            if not spotify_forms.album_has_edition:
+                if forms.album_base == track_info_album:
                     return True
 
-        if track_info_album_edition_match:
-            if "{title} - {edition}".format(
-                    **track_info_album_edition_match.groupdict()) == local_album:
+        if spotify_forms.album_has_edition:
+            if spotify_forms.album_dash == local_album:
                 return True
 
-        if local_album_edition_match:
-            local_album = local_album_edition_match.group('title')
-        else:
-            local_album = local_album
-
-        if track_info_album_edition_match:
-            track_info_album = track_info_album_edition_match.group('title')
+        return forms.album_base == spotify_forms.album_base
 
-        return local_album == track_info_album
+    def spotify_title_candidates(self):
+        """
+        Every cleaned spotify track name that `_title_matches` could possibly accept for this track
+        """
+        return self.forms.title_candidates
 
-    def _track_info_artist_names(self, track_info):
-        return [self._clean_term(artist.get('name')) for artist in track_info['artists']]
-
-    def _title_matches(self, track_info):
-        track_info_title = self._clean_term(track_info['name'])
-        local_title = self._clean_term(self.title)
+    def _title_matches(self, spotify_forms):
+        forms = self.forms
+        track_info_title = spotify_forms.title
 
-        if local_title == track_info_title:
+        if forms.title == track_info_title:
             return True
 
-        featuring_match = self.FEATURING_PATTERN.search(local_title)
-        if featuring_match:
-            track_artist_names = u' and '.join(self._track_info_artist_names(track_info)).lower()
-            for featuring_artist in re.split(r",| and ", featuring_match.group('featuring').lower()):
-                featuring_artist = self._clean_term(featuring_artist)
-                missing = featuring_artist and featuring_artist not in track_artist_names
-                if missing:
-                    break
+        if forms.featuring is not None:
+            missing = any(
+                featuring_artist and featuring_artist not in spotify_forms.artists_joined
+                for featuring_artist in forms.featuring
+            )
 
             if missing:
                 # Check for non-parens versions
-                if "{title} - feat. {featuring}".format(
-                        **featuring_match.groupdict()
-                ) == track_info_title:
-                    return True
-
-                return False
-
-            feature_title = featuring_match.group('title')
-            feature_suffix = featuring_match.group('suffix')
-            local_title = "{}{}".format(
-                feature_title.strip(),
-                " {}".format(feature_suffix.strip()) if feature_suffix else ''
-            )
-
-            if local_title == track_info_title:
-                return True
-
-        version_match = self.VERSION_PATTERN.search(local_title)
-        if version_match:
-            # Check for non-parens versions
-            if "{title} - {version}".format(
-                    **version_match.groupdict()
-            ) == track_info_title:
-                return True
-
-            if "{title} {version}".format(
-                    **version_match.groupdict()
-            ) == track_info_title:
-                return True
-
-        edition_match = self.EDITION_PATTERN.search(local_title)
-        if edition_match:
-            # Check for non-parens versions
-            if "{title} - {edition}".format(
-                    **edition_match.groupdict()
-            ) == track_info_title:
-                return True
+                return forms.featuring_title == track_info_title
 
-            if "{title} {edition}".format(
-                    **edition_match.groupdict()
-            ) == track_info_title:
+            if forms.title_base == track_info_title:
                 return True
 
-        return False
+        # Check for parens & non-parens versions/editions
+        return track_info_title in forms.title_variants
 
     def __str__(self):
         return "'{}' by {} from the album {}{}".format(
@@ -238,67 +349,831 @@ class Track(object):
     def __nonzero__(self):
         return bool(self.title)
 
+    __bool__ = __nonzero__
+
+
+class PlaylistIndex(object):
+    """
+    Spotify playlist items (SpotifyTracks) keyed by their cleaned track name, so a Track is only
+    compared against the few items whose name it could match rather than the whole playlist.
+    """
+
+    def __init__(self, items=None):
+        self.items = []
+        self._by_title = defaultdict(list)
+        for item in items or []:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        position = len(self.items)
+        self.items.append(item)
+
+        if item.name is not None:
+            spotify_forms = Track.normalize_spotify_track(item)
+            self._by_title[spotify_forms.title].append((position, item, spotify_forms))
+
+    def snapshot(self):
+        """
+        A compact copy of the index for matching in another process: what find_position compares
+        tracks against, without the items themselves
+        """
+        snapshot = PlaylistIndex()
+        snapshot._by_title = {
+            title: [(position, None, spotify_forms) for position, item, spotify_forms in candidates]
+            for title, candidates in self._by_title.items()
+        }
+        return snapshot
+
+    def find(self, track):
+        """
+        Returns the first playlist item matching the track, or None
+        """
+        position = self.find_position(track)
+        return self.items[position] if position is not None else None
+
+    def find_position(self, track):
+        """
+        Returns the position of the first playlist item matching the track, or None
+        """
+        candidates = []
+        for title in track.spotify_title_candidates():
+            candidates.extend(self._by_title.get(title, ()))
+
+        compared = 0
+        try:
+            for position, item, spotify_forms in sorted(candidates, key=lambda candidate: candidate[0]):
+                compared += 1
+                if track.matches_spotify_forms(spotify_forms):
+                    return position
+            return None
+        finally:
+            metrics.increment('matcher.comparisons', compared)
+
+
+class PlaylistSync(object):
+    """
+    What syncing a gmusic playlist into its spotify playlist involves, worked out before any track
+    is searched for: the (entry id, track) pairs missing from the spotify playlist, and the uri each
+    other entry is synced as. The spotify playlist is None when it doesn't exist yet (when planning).
+    """
+    GMUSIC_PLAYLIST_FIELDS = ('id', 'name', 'lastModifiedTimestamp')
+    SPOTIFY_PLAYLIST_FIELDS = ('id', 'name', 'uri', 'snapshot_id')
+
+    def __init__(self, gmusic_playlist, spotify_playlist, last_modified, synced_entries, missing_tracks,
+                 synced_uris=()):
+        self.gmusic_playlist = gmusic_playlist
+        self.spotify_playlist = spotify_playlist
+        self.last_modified = last_modified
+        self.synced_entries = synced_entries
+        self.missing_tracks = missing_tracks
+        self.synced_uris = synced_uris
+
+    def to_plan(self, pool):
+        """
+        A JSON serializable plan of the sync once the pool has resolved its missing tracks: the
+        tracks that would be added, those already in the spotify playlist, and those that weren't
+        found
+        """
+        plan = {
+            'gmusic_playlist': {field: self.gmusic_playlist.get(field) for field in self.GMUSIC_PLAYLIST_FIELDS},
+            'spotify_playlist': {
+                field: self.spotify_playlist.get(field) for field in self.SPOTIFY_PLAYLIST_FIELDS
+            } if self.spotify_playlist else None,
+            'last_modified': self.last_modified,
+            'synced_entries': self.synced_entries,
+            'synced_uris': sorted(self.synced_uris),
+            'add': [],
+            'present': [],
+            'unmatched': [],
+        }
+        for entry_id, track in self.missing_tracks:
+            spotify_uri = pool.uri(track)
+            if not spotify_uri:
+                status = 'unmatched'
+            elif spotify_uri in self.synced_uris:
+                status = 'present'
+            else:
+                status = 'add'
+            plan[status].append({
+                'entry_id': entry_id,
+                'gmusic_id': track.gmusic_id,
+                'title': track.title,
+                'artist': track.artist,
+                'album': track.album,
+                'duration_ms': track.duration_ms,
+                'spotify_uri': spotify_uri,
+            })
+        return plan
+
+    @classmethod
+    def from_plan(cls, plan, spotify_playlist):
+        """
+        Returns the PlaylistSync a plan made by to_plan describes, syncing into the spotify
+        playlist, and a pool of its already resolved tracks
+        """
+        pool = ResolutionPool()
+        missing_tracks = []
+        # The tracks to add come first, in the order they were planned
+        for status in ('add', 'present', 'unmatched'):
+            for planned_track in plan[status]:
+                track = Track(
+                    planned_track['title'],
+                    planned_track['artist'],
+                    planned_track['album'],
+                    gmusic_id=planned_track['gmusic_id'],
+                    duration_ms=planned_track['duration_ms'],
+                )
+                pool.record(track, planned_track['spotify_uri'])
+                missing_tracks.append((planned_track['entry_id'], track))
+        pool.resolved = True
+
+        playlist_sync = cls(
+            plan['gmusic_playlist'],
+            spotify_playlist,
+            plan['last_modified'],
+            dict(plan['synced_entries']),
+            missing_tracks,
+            set(plan['synced_uris']),
+        )
+        return playlist_sync, pool
+
+
+class PlaylistReconciliation(object):
+    """
+    What reconciling a spotify playlist with its gmusic playlist involves: the uris the spotify
+    playlist holds, in order, and an (entry id, track, uri) tuple for each gmusic entry in order,
+    the uri being None for the tracks still to resolve
+    """
+
+    def __init__(self, gmusic_playlist, spotify_playlist, current_uris, entries):
+        self.gmusic_playlist = gmusic_playlist
+        self.spotify_playlist = spotify_playlist
+        self.current_uris = current_uris
+        self.entries = entries
+
+    @property
+    def missing_tracks(self):
+        return [(entry_id, track) for entry_id, track, uri in self.entries if track and not uri]
+
+
+class ResolutionPool(object):
+    """
+    The tracks missing from every playlist of a run, deduplicated by their cache key, so a track
+    that's missing from several playlists is only resolved once. The playlists can wait on each of
+    their tracks while the pool is still resolving the rest.
+    """
+
+    def __init__(self):
+        self._tracks = OrderedDict()
+        self._uris = {}
+        self._condition = threading.Condition()
+        self._finished = False
+        self.resolved = False
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def add(self, tracks):
+        for track in tracks:
+            self._tracks.setdefault(track.cache_key, track)
+
+    def resolve(self, find_tracks):
+        """
+        Resolves the spotify uri of every unique track with find_tracks, which yields the match of
+        each track given (or None), in order
+        """
+        try:
+            for key, found_track in zip(list(self._tracks), find_tracks(list(self._tracks.values()))):
+                with self._condition:
+                    self._uris[key] = found_track.spotify_uri if found_track else None
+                    self._condition.notify_all()
+            self.resolved = True
+        finally:
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+    def record(self, track, spotify_uri):
+        """
+        Records the uri a track was already resolved to
+        """
+        self._tracks.setdefault(track.cache_key, track)
+        self._uris[track.cache_key] = spotify_uri
+
+    def uri(self, track):
+        return self._uris.get(track.cache_key)
+
+    def has_resolved(self, track):
+        with self._condition:
+            return track.cache_key in self._uris
+
+    def wait(self, track):
+        """
+        Returns the spotify uri of the track (or None) once the pool has resolved it, or None if
+        resolving failed before getting to it
+        """
+        with self._condition:
+            while track.cache_key not in self._uris and not (self._finished or self.resolved):
+                self._condition.wait()
+            return self._uris.get(track.cache_key)
+
 
 class TuneZinc(object):
     SPOTIFY_PLAYLIST_NAME_FORMAT = '{name}'
-
-    def __init__(self, config):
+    # Returned by _prepare_playlist for a playlist that failed to sync
+    FAILED = object()
+
+    def __init__(self, config, scheduler=None, match_cache=None, track_info_cache=None, searches=None,
+                 catalog=None):
+        """
+        The scheduler (with its connection pool & rate limit), caches, catalog and search memo are
+        created from the config unless given, for several accounts' TuneZincs to share them
+        """
         self.config = config
+        self.catalog = catalog or CatalogIndex(
+            config.TUNEZINC_CATALOG_LOCATION,
+            max_entries=config.TUNEZINC_CATALOG_SIZE,
+        )
         self.gmusic = Gmusic(
             config.GMUSIC_PLAYLISTS, 
             config.GMUSIC_CREDENTIALS_STORAGE_LOCATION,
-            config.DEBUG
+            config.DEBUG,
+            track_info_cache or TrackInfoCache(config.TUNEZINC_CACHE_LOCATION),
         )
         self.spotify = Spotify(
             config.SPOTIFY_USERNAME,
             config.SPOTIFY_CLIENT_ID,
             config.SPOTIFY_CLIENT_SECRET,
             config.SPOTIFY_CREATE_PUBLIC,
+            config.SPOTIFY_SEARCH_WORKERS,
+            scheduler or RequestScheduler(
+                rate=config.SPOTIFY_REQUESTS_PER_SECOND,
+                max_retries=config.SPOTIFY_MAX_RETRIES,
+                pool_size=config.SPOTIFY_SEARCH_WORKERS * config.TUNEZINC_PLAYLIST_WORKERS,
+            ),
+            CandidateScorer(threshold=config.SPOTIFY_MATCH_THRESHOLD),
+            searches,
+            self.catalog,
+            TokenStore(
+                config.SPOTIFY_TOKEN_LOCATION,
+                config.SPOTIFY_CLIENT_ID,
+                config.SPOTIFY_CLIENT_SECRET,
+                scope=Spotify.SCOPES,
+                token_url=config.SPOTIFY_TOKEN_URL,
+                refresh_margin=config.SPOTIFY_TOKEN_REFRESH_MARGIN,
+            ),
         )
-
-    def sync(self):
-        logger.info("Found {}/{} gmusic playlists to sync".format(len(self.gmusic.playlists),
+        self.match_cache = match_cache or MatchCache(
+            config.TUNEZINC_CACHE_LOCATION,
+            max_entries=config.TUNEZINC_MATCH_CACHE_SIZE,
+            miss_ttl=config.TUNEZINC_MATCH_CACHE_MISS_TTL,
+        )
+        self.sync_state = SyncState(config.TUNEZINC_STATE_LOCATION)
+
+    def refresh(self):
+        """
+        Forgets the playlists listed so far, for a long running process to see what changed since
+        """
+        self.gmusic.refresh()
+        self.spotify.refresh()
+
+    def close(self):
+        """
+        Stops the background work the clients do, once done syncing
+        """
+        self.spotify.close()
+
+    def sync(self, full=False, playlists=None):
+        """
+        Syncs every gmusic playlist, or only the given ones, up to TUNEZINC_PLAYLIST_WORKERS of them
+        at once. Returns a dict of each playlist's name to the number of tracks added to it, or None
+        if it failed to sync.
+        """
+        if playlists is None:
+            with metrics.phase('playlist_fetch'):
+                playlists = self.gmusic.playlists
+        logger.info("Found {}/{} gmusic playlists to sync".format(len(playlists),
                                                                    len(
                                                                        self.config.GMUSIC_PLAYLISTS)))
+        if not playlists:
+            return {}
+
+        workers = max(1, min(self.config.TUNEZINC_PLAYLIST_WORKERS, len(playlists)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            playlist_syncs = list(executor.map(
+                logcontext.bind(lambda playlist: self._prepare_playlist(playlist, full)), playlists))
+
+            pool = ResolutionPool()
+            for playlist_sync in playlist_syncs:
+                if isinstance(playlist_sync, PlaylistSync):
+                    pool.add(track for entry_id, track in playlist_sync.missing_tracks)
+            # Resolved on a thread of its own, so each playlist adds its tracks as they're found
+            with ThreadPoolExecutor(max_workers=1) as resolver:
+                resolver.submit(logcontext.bind(self._resolve), pool)
+                results = list(executor.map(
+                    logcontext.bind(lambda playlist_sync: self._apply_playlist(playlist_sync, pool)),
+                    playlist_syncs))
+
+        summary = {}
+        for gmusic_playlist, added in zip(playlists, results):
+            summary[gmusic_playlist['name']] = added
+            if added is None:
+                logger.error("'{}': failed to sync".format(gmusic_playlist['name']))
+            else:
+                logger.info("'{}': added {} track(s)".format(gmusic_playlist['name'], added))
+        return summary
+
+    def _prepare_playlist(self, gmusic_playlist, full=False, create=True):
+        """
+        Returns the PlaylistSync of the gmusic playlist, None if it has nothing to sync, or FAILED.
+        A missing spotify playlist is created, unless `create` is False.
+        """
+        with playlist_context(gmusic_playlist['name']):
+            try:
+                logger.info("Gmusic Playlist: {name} ({id})".format(**gmusic_playlist))
+
+                spotify_playlist_name = self._format_spotify_playlist_name(gmusic_playlist['name'])
+                with metrics.phase('playlist_fetch'):
+                    if create:
+                        spotify_playlist = self.spotify.get_or_create_playlist(spotify_playlist_name)
+                    else:
+                        spotify_playlist = self.spotify.playlists.get(spotify_playlist_name)
+
+                if spotify_playlist:
+                    logger.info("Spotify Playlist: {name} ({id})".format(**spotify_playlist))
+                else:
+                    logger.info("Spotify Playlist: {} (to be created)".format(spotify_playlist_name))
+                return self.find_missing_tracks(gmusic_playlist, spotify_playlist, full=full)
+            except Exception:
+                logger.exception("Failed to sync playlist")
+                return self.FAILED
+
+    def plan(self, full=False, playlists=None):
+        """
+        Works out what syncing every gmusic playlist (or only the given ones) would do, fetching
+        the playlists & searching for the missing tracks like sync does but without adding any
+        tracks or creating any playlists. Returns a JSON serializable plan of each playlist's
+        sync, which `apply` can carry out later without searching again.
+        """
+        if playlists is None:
+            with metrics.phase('playlist_fetch'):
+                playlists = self.gmusic.playlists
+
+        workers = max(1, min(self.config.TUNEZINC_PLAYLIST_WORKERS, len(playlists) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            playlist_syncs = list(executor.map(
+                logcontext.bind(lambda playlist: self._prepare_playlist(playlist, full, create=False)), playlists))
+
+        pool = ResolutionPool()
+        for playlist_sync in playlist_syncs:
+            if isinstance(playlist_sync, PlaylistSync):
+                pool.add(track for entry_id, track in playlist_sync.missing_tracks)
+        self._resolve(pool)
+        self.sync_state.save()
+
+        plan = {
+            'created_at': datetime.utcnow().replace(tzinfo=pytz.utc).isoformat(),
+            'full': full,
+            'playlists': [],
+            'unchanged': [],
+            'failed': [],
+        }
+        for gmusic_playlist, playlist_sync in zip(playlists, playlist_syncs):
+            if playlist_sync is self.FAILED or (playlist_sync and playlist_sync.missing_tracks and not pool.resolved):
+                plan['failed'].append(gmusic_playlist['name'])
+            elif playlist_sync is None:
+                plan['unchanged'].append(gmusic_playlist['name'])
+            else:
+                plan['playlists'].append(playlist_sync.to_plan(pool))
+        return plan
+
+    def apply(self, plan):
+        """
+        Carries out a plan made by `plan`, adding the tracks it found without searching for them
+        again. A playlist whose spotify playlist changed since it was planned is skipped, as the
+        plan may no longer be right for it. Returns a dict like sync does.
+        """
+        summary = {}
+        for plan_playlist in plan['playlists']:
+            name = plan_playlist['gmusic_playlist']['name']
+            with playlist_context(name):
+                summary[name] = self._apply_plan_playlist(plan_playlist)
+        for name in plan['failed']:
+            summary[name] = None
+        return summary
+
+    def _apply_plan_playlist(self, plan_playlist):
+        spotify_playlist_name = self._format_spotify_playlist_name(plan_playlist['gmusic_playlist']['name'])
+        try:
+            spotify_playlist = self.spotify.playlists.get(spotify_playlist_name)
+            planned = plan_playlist['spotify_playlist']
+            planned_snapshot_id = planned.get('snapshot_id') if planned else None
+            if planned_snapshot_id != (spotify_playlist.get('snapshot_id') if spotify_playlist else None):
+                logger.warning("Spotify playlist changed since the plan was made, skipping it. Plan again to sync it.")
+                return None
+
+            if not spotify_playlist:
+                spotify_playlist = self.spotify.get_or_create_playlist(spotify_playlist_name)
+
+            playlist_sync, pool = PlaylistSync.from_plan(plan_playlist, spotify_playlist)
+            return self.apply_playlist_sync(playlist_sync, pool)
+        except Exception:
+            logger.exception("Failed to apply the plan")
+            return None
+        finally:
+            self.sync_state.save()
+
+    def reconcile(self, playlists=None):
+        """
+        Makes the spotify playlist of every gmusic playlist (or only of the given ones) hold exactly
+        the gmusic playlist's tracks, in its order: tracks no longer in the gmusic playlist are
+        removed, missing ones added and misplaced ones moved, touching as few tracks as possible.
+        Returns a dict of each playlist's name to the number of tracks removed, added or moved, or
+        None if it failed to reconcile.
+        """
+        if playlists is None:
+            with metrics.phase('playlist_fetch'):
+                playlists = self.gmusic.playlists
+        if not playlists:
+            return {}
+
+        workers = max(1, min(self.config.TUNEZINC_PLAYLIST_WORKERS, len(playlists)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            reconciliations = list(executor.map(logcontext.bind(self._prepare_reconciliation), playlists))
+
+            pool = ResolutionPool()
+            for reconciliation in reconciliations:
+                if reconciliation is not self.FAILED:
+                    pool.add(track for entry_id, track in reconciliation.missing_tracks)
+            self._resolve(pool)
+
+            results = list(executor.map(
+                logcontext.bind(lambda reconciliation: self._apply_reconciliation(reconciliation, pool)),
+                reconciliations))
+
+        summary = {}
+        for gmusic_playlist, touched in zip(playlists, results):
+            summary[gmusic_playlist['name']] = touched
+            if touched is None:
+                logger.error("'{}': failed to reconcile".format(gmusic_playlist['name']))
+            else:
+                logger.info("'{}': removed, added or moved {} track(s)".format(gmusic_playlist['name'], touched))
+        return summary
+
+    def _prepare_reconciliation(self, gmusic_playlist):
+        """
+        Returns the PlaylistReconciliation of the gmusic playlist, or FAILED. Entries are matched to
+        the uri they were last synced as while the spotify playlist still holds it, otherwise to
+        a track of the spotify playlist, and are left for the pool to resolve if neither is found.
+        """
+        with playlist_context(gmusic_playlist['name']):
+            try:
+                logger.info("Gmusic Playlist: {name} ({id})".format(**gmusic_playlist))
+                with metrics.phase('playlist_fetch'):
+                    spotify_playlist = self.spotify.get_or_create_playlist(
+                        self._format_spotify_playlist_name(gmusic_playlist['name']))
+                    gmusic_entries = self.gmusic.get_playlist_entries(gmusic_playlist)
+                logger.info("Spotify Playlist: {name} ({id})".format(**spotify_playlist))
+
+                spotify_playlist_index = self._spotify_playlist_index(spotify_playlist)
+                current_uris = [item.uri for item in spotify_playlist_index.items]
+                if None in current_uris:
+                    logger.error("Spotify playlist has items that aren't tracks, which can't be reconciled")
+                    return self.FAILED
+
+                playlist_state = self.sync_state.get(gmusic_playlist['id'])
+                previously_synced = playlist_state['entries'] if playlist_state else {}
+                present_uris = set(current_uris)
+
+                entries = []
+                entry_tracks = self._gmusic_entry_tracks(gmusic_playlist, enumerate(gmusic_entries, start=1))
+                with metrics.phase('missing_detection'):
+                    unsynced_tracks = [
+                        track for track_number, track_value, track in entry_tracks
+                        if track and previously_synced.get(track_value.id) not in present_uris
+                    ]
+                    items = iter(self._find_in_index(spotify_playlist_index, unsynced_tracks))
+                    for track_number, track_value, track in entry_tracks:
+                        uri = previously_synced.get(track_value.id)
+                        if track and uri not in present_uris:
+                            item = next(items)
+                            uri = item.uri if item else None
+                        entries.append((track_value.id, track, uri))
+
+                return PlaylistReconciliation(gmusic_playlist, spotify_playlist, current_uris, entries)
+            except Exception:
+                logger.exception("Failed to reconcile playlist")
+                return self.FAILED
+
+    def _apply_reconciliation(self, reconciliation, pool):
+        """
+        Edits the spotify playlist of a prepared reconciliation into the order of its gmusic
+        playlist, and records it as synced. Returns the number of tracks removed, added or moved, or
+        None if the playlist failed to reconcile.
+        """
+        if reconciliation is self.FAILED:
+            return None
+
+        gmusic_playlist = reconciliation.gmusic_playlist
+        spotify_playlist = reconciliation.spotify_playlist
+        with playlist_context(gmusic_playlist['name']):
+            if reconciliation.missing_tracks and not pool.resolved:
+                return None
+            try:
+                synced_entries = {}
+                entry_uris = []
+                for entry_id, track, uri in reconciliation.entries:
+                    if track and not uri:
+                        uri = pool.uri(track)
+                    synced_entries[entry_id] = uri
+                    entry_uris.append(uri)
+
+                target = target_uris(reconciliation.current_uris, entry_uris)
+                operations = edit_script(reconciliation.current_uris, target)
+                logger.info("{} edit(s) to reconcile the playlist".format(len(operations)))
+                if not self.spotify.edit_playlist(spotify_playlist, operations):
+                    return None
+
+                if operations:
+                    snapshot = self.sync_state.get_snapshot(spotify_playlist['id'])
+                    latest_addition = snapshot['latest_addition'] if snapshot else None
+                    if any(operation[0] == 'add' for operation in operations):
+                        latest_addition = datetime.utcnow().replace(tzinfo=pytz.utc).isoformat()
+                    self.sync_state.set_snapshot(
+                        spotify_playlist['id'],
+                        spotify_playlist.get('snapshot_id'),
+                        len(target),
+                        latest_addition,
+                    )
+                self.sync_state.set(
+                    gmusic_playlist['id'],
+                    gmusic_playlist.get('lastModifiedTimestamp'),
+                    synced_entries,
+                    spotify_playlist['id'],
+                )
+                return tracks_touched(operations)
+            except Exception:
+                logger.exception("Failed to reconcile playlist")
+                return None
+            finally:
+                self.sync_state.save()
+
+    def _resolve(self, pool):
+        if not len(pool):
+            pool.resolved = True
+            self.catalog.commit()
+            return
 
-        for gmusic_playlist in self.gmusic.playlists:
-            logger.info("Gmusic Playlist: {name} ({id})".format(**gmusic_playlist))
-
-            spotify_playlist = self.spotify.get_or_create_playlist(
-                self._format_spotify_playlist_name(gmusic_playlist['name'])
-            )
-            logger.info("Spotify Playlist: {name} ({id})".format(**spotify_playlist))
-            self.sync_playlists(gmusic_playlist, spotify_playlist)
+        logger.info("Resolving {} unique missing track(s)".format(len(pool)))
+        try:
+            pool.resolve(self.find_tracks)
+        except Exception:
+            logger.exception("Failed to resolve the missing tracks")
+        finally:
+            self.match_cache.commit()
+            self.catalog.commit()
+
+    def _apply_playlist(self, playlist_sync, pool):
+        """
+        Adds the resolved missing tracks of a prepared playlist. Returns the number of tracks added,
+        or None if the playlist failed to sync.
+        """
+        if playlist_sync is self.FAILED:
+            return None
+        if playlist_sync is None:
+            return 0
+
+        with playlist_context(playlist_sync.gmusic_playlist['name']):
+            try:
+                added = self.apply_playlist_sync(playlist_sync, pool)
+            except Exception:
+                logger.exception("Failed to sync playlist")
+                return None
+            finally:
+                self.sync_state.save()
+
+            # Resolving failed before getting to some of its tracks, which are left for the next sync
+            if not all(pool.has_resolved(track) for entry_id, track in playlist_sync.missing_tracks):
+                return None
+            return added
 
     def _format_spotify_playlist_name(self, name):
         return self.SPOTIFY_PLAYLIST_NAME_FORMAT.format(name=name)
 
-    def spotify_playlist_has_track(self, playlist, track):
-        items = playlist.get('items')
-        if not items:
-            return False
+    def find_tracks(self, tracks):
+        """
+        Yields the spotify match for each of the tracks (or None), in order. Tracks already in the
+        match cache are answered from it, and then those matching a track in the catalog of spotify
+        tracks seen before. Only the rest are searched for on spotify. A track whose search failed
+        isn't remembered as unmatched, so the next run searches for it again.
+        """
+        lookups = [(track, self.match_cache.get(track.cache_key)) for track in tracks]
+        hits = sum(1 for track, cached in lookups if cached is not None)
+        metrics.cache_lookup('match_cache', hits=hits, misses=len(lookups) - hits)
+
+        catalogued = set()
+        for track, cached in lookups:
+            if cached is None:
+                spotify_track = self.catalog.find(track)
+                if spotify_track is not None:
+                    track.spotify_uri = spotify_track.uri
+                    catalogued.add(track)
+        metrics.cache_lookup('catalog', hits=len(catalogued), misses=len(lookups) - hits - len(catalogued))
+        searches = self.spotify.find_tracks([
+            track for track, cached in lookups if cached is None and track not in catalogued
+        ])
+
+        for track, cached in lookups:
+            if track in catalogued:
+                logger.debug("Found {} in the catalog".format(track))
+                self.match_cache.set(track.cache_key, track.spotify_uri)
+                yield track
+            elif cached is None:
+                found_track = next(searches)
+                if found_track is Spotify.SEARCH_FAILED:
+                    yield None
+                    continue
+                self.match_cache.set(track.cache_key, found_track.spotify_uri if found_track else None)
+                yield found_track
+            elif cached is MatchCache.MISSING:
+                logger.debug("Skipping previously unmatched track {}".format(track))
+                yield None
+            else:
+                track.spotify_uri = cached
+                yield track
+
+    def _gmusic_entry_tracks(self, gmusic_playlist, entries):
+        """
+        Returns a (track number, entry, Track) tuple for each of the (track number, entry) pairs,
+        Track being None for entries without any track info. The info of uploaded songs, which
+        entries don't include, is looked up all at once.
+        """
+        entry_tracks = [
+            (track_number, track_value, Track.from_gmusic_track(track_value.track) if track_value.track else None)
+            for track_number, track_value in entries
+        ]
+
+        uploaded_songs = self.gmusic.get_uploaded_songs(
+            track_value.track_id for track_number, track_value, track in entry_tracks if not track
+        )
 
-        for item in items:
-            track_info = item.get('track')
-            if track_info and track.matches_spotify_track_info(track_info):
-                return True
-        return False
+        tracks = []
+        for track_number, track_value, track in entry_tracks:
+            if not track:
+                uploaded_track = uploaded_songs.get(track_value.track_id)
+                if uploaded_track:
+                    track = Track.from_gmusic_track(uploaded_track)
 
-    def sync_playlists(self, gmusic_playlist, spotify_playlist):
-        logger.debug("Synchronizing playlist...")
+            if not track:
+                logger.error("Track {} from '{}' playlist has no track info associated with it!, {}".format(
+                    track_number,
+                    gmusic_playlist['name'],
+                    track_value
+                ))
+                track = None
+
+            tracks.append((track_number, track_value, track))
+        return tracks
+
+    def _tracks_to_add(self, missing_tracks, pool, synced_uris, present_tracks):
+        """
+        Yields each of the missing tracks to add once the pool has resolved it, collecting those
+        resolved to one of the synced_uris in present_tracks instead
+        """
+        for entry_id, track in missing_tracks:
+            track.spotify_uri = pool.wait(track)
+            if track.spotify_uri in synced_uris:
+                present_tracks.add(track)
+            elif track.spotify_uri:
+                yield track
+
+    def _add_missing_tracks(self, spotify_playlist, missing_tracks, synced_entries, pool, synced_uris=()):
+        """
+        Adds the (entry id, track) pairs missing from the spotify playlist as the pool resolves them,
+        recording the uri of each entry that was synced in synced_entries. Tracks resolved to one of
+        the synced_uris are already in the playlist so aren't added again. Returns the number of
+        tracks added.
+        """
+        logger.debug("Identified {} missing track(s)".format(len(missing_tracks)))
 
-        if not gmusic_playlist['tracks']:
-            logger.info("No tracks found in gmusic playlist '{}'".format(gmusic_playlist['name']))
-            return
+        present_tracks = set()
+        previous_snapshot_id = spotify_playlist.get('snapshot_id')
+        added_tracks = self.spotify.add_tracks_to_playlist(
+            spotify_playlist, self._tracks_to_add(missing_tracks, pool, synced_uris, present_tracks))
+        if added_tracks:
+            self._record_spotify_additions(spotify_playlist, previous_snapshot_id, added_tracks)
+        added_tracks = set(added_tracks)
+        for entry_id, track in missing_tracks:
+            if track in added_tracks or track in present_tracks:
+                synced_entries[entry_id] = track.spotify_uri
+            else:
+                synced_entries[entry_id] = None
+
+        logger.info("Added {}/{} missing track(s)!".format(len(added_tracks), len(missing_tracks)))
+        return len(added_tracks)
+
+    def sync_playlists(self, gmusic_playlist, spotify_playlist, full=False):
+        """
+        Adds the tracks of the gmusic playlist that are missing from the spotify playlist. Once a
+        playlist has been synced, later syncs only look at the entries added to it since, unless
+        `full` is set. Returns the number of tracks added.
+        """
+        playlist_sync = self.find_missing_tracks(gmusic_playlist, spotify_playlist, full=full)
+        if playlist_sync is None:
+            return 0
+
+        pool = ResolutionPool()
+        pool.add(track for entry_id, track in playlist_sync.missing_tracks)
+        pool.resolve(self.find_tracks)
+        return self.apply_playlist_sync(playlist_sync, pool)
+
+    def apply_playlist_sync(self, playlist_sync, pool):
+        """
+        Adds the missing tracks of the playlist the pool resolved, and records what was synced.
+        Returns the number of tracks added.
+        """
+        added = 0
+        if playlist_sync.missing_tracks:
+            added = self._add_missing_tracks(
+                playlist_sync.spotify_playlist,
+                playlist_sync.missing_tracks,
+                playlist_sync.synced_entries,
+                pool,
+                playlist_sync.synced_uris,
+            )
+        else:
+            logger.info("No missing tracks!")
 
-        spotify_playlist_tracks = self.spotify.get_playlist_tracks(spotify_playlist['uri'])
+        self.sync_state.set(
+            playlist_sync.gmusic_playlist['id'],
+            playlist_sync.last_modified,
+            playlist_sync.synced_entries,
+            playlist_sync.spotify_playlist['id'],
+        )
+        return added
+
+    def find_missing_tracks(self, gmusic_playlist, spotify_playlist, full=False):
+        """
+        Works out which tracks of the gmusic playlist are missing from the spotify playlist, looking
+        only at the entries added since the last sync unless `full` is set. The spotify playlist is
+        only downloaded when its snapshot changed since it was last seen. Returns a PlaylistSync, or
+        None if the playlist has nothing to sync.
+        """
+        logger.debug("Synchronizing playlist...")
 
-        spotify_max_date = self.spotify.get_latest_addition_date(spotify_playlist_tracks)
-        spotify_tracks_count = len(spotify_playlist_tracks.get('items', []))
+        playlist_state = self.sync_state.get(gmusic_playlist['id'])
+        if playlist_state is not None and not self._synced_to(playlist_state, spotify_playlist):
+            # What was synced before isn't in this spotify playlist, like when it was deleted and
+            # created again, so every track needs syncing again
+            logger.info("Spotify playlist wasn't synced before, syncing every track")
+            playlist_state = None
+
+        last_modified = gmusic_playlist.get('lastModifiedTimestamp')
+        if (not full and playlist_state is not None and last_modified and
+                last_modified == playlist_state['last_modified']):
+            logger.info("Gmusic playlist unchanged since it was last synced. Skipping ({}).".format(
+                gmusic_playlist['name']
+            ))
+            return None
+
+        with metrics.phase('playlist_fetch'):
+            gmusic_entries = self.gmusic.get_playlist_entries(gmusic_playlist)
+        if not gmusic_entries:
+            logger.info("No tracks found in gmusic playlist '{}'".format(gmusic_playlist['name']))
+            self.sync_state.see(gmusic_playlist['id'], last_modified)
+            return None
+
+        snapshot = self.sync_state.get_snapshot(spotify_playlist['id']) if spotify_playlist else None
+        spotify_unchanged = bool(snapshot) and spotify_playlist.get('snapshot_id') == snapshot['snapshot_id']
+
+        if playlist_state is not None and (not full or spotify_unchanged):
+            # While the spotify playlist is unchanged since it was last synced, the entries synced
+            # then are still in it, so even a full sync only needs to look at the others
+            return self._find_new_entries(gmusic_playlist, gmusic_entries, spotify_playlist, playlist_state)
+
+        spotify_playlist_index = None
+        if not spotify_playlist:
+            # It doesn't exist yet, so everything is missing from it
+            spotify_playlist_index = PlaylistIndex()
+            spotify_max_date = None
+            spotify_tracks_count = 0
+        elif spotify_unchanged:
+            logger.debug("Spotify playlist unchanged since snapshot {}".format(snapshot['snapshot_id']))
+            spotify_max_date = (
+                dateutil.parser.parse(snapshot['latest_addition']) if snapshot['latest_addition'] else None
+            )
+            spotify_tracks_count = snapshot['count']
+        else:
+            spotify_playlist_index = self._spotify_playlist_index(spotify_playlist)
+            spotify_max_date = self.spotify.get_latest_addition_date(spotify_playlist_index.items)
+            spotify_tracks_count = len(spotify_playlist_index)
 
         gmusic_max_date = self.gmusic.get_latest_addition_date(gmusic_playlist)
         gmusic_tracks_count = len(
-            [track for track in gmusic_playlist['tracks'] if track.get('track')])
+            [track for track in gmusic_entries if track.track])
 
         if (spotify_max_date and gmusic_max_date and
                 (spotify_max_date >= gmusic_max_date) and
@@ -308,42 +1183,113 @@ class TuneZinc(object):
                     gmusic_playlist['name']
                 )
             )
-            return
+            self.sync_state.see(gmusic_playlist['id'], last_modified)
+            return None
 
-        missing_tracks = []
-        for track_numner, track_value in enumerate(gmusic_playlist['tracks'], start=1):
-            track = Track.from_gmusic_track_info(track_value.get('track', {}))
-            if not track:
-                uploaded_track = self.gmusic.uploaded_songs.get(track_value['trackId'])
-                if uploaded_track:
-                    track = Track.from_gmusic_track_info(uploaded_track)
+        if spotify_playlist_index is None:
+            spotify_playlist_index = self._spotify_playlist_index(spotify_playlist)
 
-            if not track:
-                logger.error("Track {} from '{}' playlist has no track info associated with it!, {}".format(
-                    track_numner,
-                    gmusic_playlist['name'],
-                    track_value
-                ))
-                continue
+        synced_entries = {}
+        missing_tracks = []
+        entry_tracks = self._gmusic_entry_tracks(gmusic_playlist, enumerate(gmusic_entries, start=1))
+        with metrics.phase('missing_detection'):
+            items = iter(self._find_in_index(
+                spotify_playlist_index, [track for track_number, track_value, track in entry_tracks if track]))
+            for track_number, track_value, track in entry_tracks:
+                if not track:
+                    synced_entries[track_value.id] = None
+                    continue
+
+                item = next(items)
+                if item:
+                    synced_entries[track_value.id] = item.uri
+                else:
+                    missing_tracks.append((track_value.id, track))
+
+        # A missing track the exact index didn't find may still resolve to one of the playlist's
+        # tracks, by a fuzzier match, which mustn't be added again
+        present_uris = set(item.uri for item in spotify_playlist_index.items if item.uri)
+        return PlaylistSync(
+            gmusic_playlist, spotify_playlist, last_modified, synced_entries, missing_tracks, present_uris)
+
+    def _synced_to(self, playlist_state, spotify_playlist):
+        """
+        Whether the playlist state was synced to the spotify playlist, as it is now: the playlist
+        exists, is the one synced to, and was seen since
+        """
+        if not spotify_playlist:
+            return False
+        synced_id = playlist_state.get('spotify_playlist_id')
+        if synced_id is not None and synced_id != spotify_playlist['id']:
+            return False
+        return self.sync_state.get_snapshot(spotify_playlist['id']) is not None
+
+    def _find_in_index(self, playlist_index, tracks):
+        """
+        Returns the first item of the PlaylistIndex matching each of the tracks (or None), in order,
+        spreading the matching of many tracks over TUNEZINC_MATCH_PROCESSES processes
+        """
+        return find_in_index(playlist_index, tracks, self.config.TUNEZINC_MATCH_PROCESSES)
+
+    def _spotify_playlist_index(self, spotify_playlist):
+        """
+        Downloads the spotify playlist's tracks into a PlaylistIndex, recording its snapshot
+        """
+        with metrics.phase('spotify_track_fetch'):
+            spotify_playlist_index = PlaylistIndex(self.spotify.get_playlist_tracks(spotify_playlist['uri']))
+        self.catalog.add(spotify_playlist_index.items)
+
+        latest_addition = self.spotify.get_latest_addition_date(spotify_playlist_index.items)
+        self.sync_state.set_snapshot(
+            spotify_playlist['id'],
+            spotify_playlist.get('snapshot_id'),
+            len(spotify_playlist_index),
+            latest_addition.isoformat() if latest_addition else None,
+        )
+        return spotify_playlist_index
+
+    def _record_spotify_additions(self, spotify_playlist, previous_snapshot_id, added_tracks):
+        """
+        Brings the recorded snapshot of the spotify playlist up to date with the tracks just added to
+        it, provided it was current before they were
+        """
+        snapshot = self.sync_state.get_snapshot(spotify_playlist['id'])
+        if not snapshot or snapshot['snapshot_id'] != previous_snapshot_id:
+            return
 
-            if not self.spotify_playlist_has_track(spotify_playlist_tracks, track):
-                missing_tracks.append(track)
+        self.sync_state.set_snapshot(
+            spotify_playlist['id'],
+            spotify_playlist.get('snapshot_id'),
+            snapshot['count'] + len(added_tracks),
+            datetime.utcnow().replace(tzinfo=pytz.utc).isoformat(),
+        )
 
-        if not missing_tracks:
-            logger.info("No missing tracks!")
-            return
+    def _find_new_entries(self, gmusic_playlist, gmusic_entries, spotify_playlist, playlist_state):
+        previously_synced = playlist_state['entries']
+        synced_uris = set(uri for uri in previously_synced.values() if uri)
 
-        logger.debug("Identified {} missing track(s)".format(len(missing_tracks)))
+        synced_entries = {}
+        new_entries = []
+        for track_number, track_value in enumerate(gmusic_entries, start=1):
+            entry_id = track_value.id
+            if previously_synced.get(entry_id):
+                synced_entries[entry_id] = previously_synced[entry_id]
+            else:
+                new_entries.append((track_number, track_value))
 
-        found_tracks = []
-        for missing_track in missing_tracks:
-            track = self.spotify.find_track(missing_track)
+        missing_tracks = []
+        for track_number, track_value, track in self._gmusic_entry_tracks(gmusic_playlist, new_entries):
+            synced_entries[track_value.id] = None
             if track:
-                found_tracks.append(track)
+                missing_tracks.append((track_value.id, track))
 
-        logger.debug("Found {}/{} missing track(s)".format(len(found_tracks), len(missing_tracks)))
+        logger.debug("{} new or unsynced entries since the last sync".format(len(missing_tracks)))
 
-        if found_tracks:
-            self.spotify.add_tracks_to_playlist(spotify_playlist, found_tracks)
-            logger.info(
-                "Added {}/{} missing track(s)!".format(len(found_tracks), len(missing_tracks)))
+        return PlaylistSync(
+            gmusic_playlist,
+            spotify_playlist,
+            gmusic_playlist.get('lastModifiedTimestamp'),
+            synced_entries,
+            missing_tracks,
+            synced_uris,
+        )
@@ -0,0 +1,95 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher(object):
+    """
+    Keeps a TuneZinc, its authenticated clients and its caches around, polling for playlists that
+    changed since they were last synced and only syncing those. Polls get further apart, up to
+    `max_interval` seconds, for as long as nothing changes, and go back to every `min_interval`
+    seconds as soon as something does.
+
+    A gmusic playlist changed when its lastModifiedTimestamp did since a sync last looked at it,
+    whether or not that sync had anything to do. Its spotify playlist changed when its snapshot_id
+    is no longer the one recorded when it was last synced (TuneZinc keeps that up to date with its
+    own additions), or it was deleted, in which case it's fully synced.
+    """
+    BACKOFF = 2
+
+    def __init__(self, tunezinc, min_interval=60, max_interval=900):
+        self.tunezinc = tunezinc
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+
+    def changed_playlists(self):
+        """
+        Returns the gmusic playlists that changed since they were last synced, and those whose
+        spotify playlist changed
+        """
+        tunezinc = self.tunezinc
+        tunezinc.refresh()
+
+        changed = []
+        spotify_changed = []
+        for gmusic_playlist in tunezinc.gmusic.playlists:
+            last_seen = tunezinc.sync_state.last_seen(gmusic_playlist['id'])
+            if last_seen is None or last_seen != gmusic_playlist.get('lastModifiedTimestamp'):
+                changed.append(gmusic_playlist)
+                continue
+
+            try:
+                spotify_playlist = tunezinc.spotify.get_playlist(
+                    tunezinc._format_spotify_playlist_name(gmusic_playlist['name'])
+                )
+            except KeyError:
+                # A playlist that had nothing to sync yet never had a spotify playlist created
+                if tunezinc.sync_state.get(gmusic_playlist['id']):
+                    spotify_changed.append(gmusic_playlist)
+                continue
+
+            snapshot = tunezinc.sync_state.get_snapshot(spotify_playlist['id'])
+            if snapshot and snapshot['snapshot_id'] != spotify_playlist.get('snapshot_id'):
+                spotify_changed.append(gmusic_playlist)
+
+        return changed, spotify_changed
+
+    def poll(self):
+        """
+        Syncs the playlists that changed. Returns whether any did.
+        """
+        changed, spotify_changed = self.changed_playlists()
+        if not changed and not spotify_changed:
+            logger.debug("No playlists changed")
+            return False
+
+        logger.info("{} playlist(s) changed on gmusic, {} on spotify".format(len(changed), len(spotify_changed)))
+        if changed:
+            self.tunezinc.sync(playlists=changed)
+        if spotify_changed:
+            self.tunezinc.sync(full=True, playlists=spotify_changed)
+        return True
+
+    def run(self, polls=None):
+        """
+        Polls until interrupted, or `polls` times
+        """
+        count = 0
+        while polls is None or count < polls:
+            try:
+                changed = self.poll()
+            except Exception:
+                logger.exception("Failed to poll for changes")
+                changed = False
+            count += 1
+
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.BACKOFF)
+
+            if polls is None or count < polls:
+                logger.debug("Polling again in {}s".format(self.interval))
+                time.sleep(self.interval)
@@ -0,0 +1,268 @@
+"""
+In-process stand-ins for the gmusicapi clients and the spotipy client that serve a fixture (see
+payloads.py), sleeping `latency` seconds per call to mimic the network and counting every call
+"""
+import copy
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+QUERY_FIELD_PATTERN = re.compile(r'(track|artist|album):"([^"]*)"')
+
+
+def _words(text):
+    return WORD_PATTERN.findall(text.replace('&', 'and').lower())
+
+
+class CallCounter(object):
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+class FakeService(object):
+
+    def __init__(self, prefix, calls, latency=0):
+        self.prefix = prefix
+        self.calls = calls
+        self.latency = latency
+
+    def _call(self, name):
+        self.calls.increment('{}.{}'.format(self.prefix, name))
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeMobileclient(FakeService):
+
+    def __init__(self, fixture, calls, latency=0):
+        super(FakeMobileclient, self).__init__('gmusic', calls, latency)
+        self.fixture = fixture
+
+    def is_authenticated(self):
+        return True
+
+    def get_all_playlists(self):
+        self._call('get_all_playlists')
+        return [
+            {key: value for key, value in playlist.items() if key != 'tracks'}
+            for playlist in self.fixture['gmusic_playlists']
+        ]
+
+    def get_all_user_playlist_contents(self):
+        self._call('get_all_user_playlist_contents')
+        return copy.deepcopy(self.fixture['gmusic_playlists'])
+
+
+class FakeMusicmanager(FakeService):
+
+    def __init__(self, fixture, calls, latency=0):
+        super(FakeMusicmanager, self).__init__('gmusic', calls, latency)
+        self.fixture = fixture
+
+    def is_authenticated(self):
+        return True
+
+    def get_uploaded_songs(self, incremental=False):
+        songs = self.fixture['uploaded_songs']
+        chunks = [songs[start:start + 1000] for start in range(0, len(songs), 1000)]
+        if not incremental:
+            self._call('get_uploaded_songs')
+            return [song for chunk in chunks for song in chunk]
+        return self._iter_uploaded_songs(chunks)
+
+    def _iter_uploaded_songs(self, chunks):
+        for chunk in chunks:
+            self._call('get_uploaded_songs')
+            yield copy.deepcopy(chunk)
+
+
+class FakeSpotifyClient(FakeService):
+    """
+    Serves searches from an inverted index of the fixture's spotify catalog: a query matches the
+    tracks containing every word of each of its track/artist/album fields (or of the whole query
+    when it has no fields)
+    """
+    PAGE_SIZE = 100
+
+    def __init__(self, fixture, username, calls, latency=0):
+        super(FakeSpotifyClient, self).__init__('spotify', calls, latency)
+        self.username = username
+        self.catalog = {track_info['uri']: track_info for track_info in fixture['spotify_catalog']}
+        self.playlists = {}
+        self._lock = threading.Lock()
+        self._snapshots = 0
+        self._created = 0
+
+        self._index = defaultdict(set)
+        for track_info in fixture['spotify_catalog']:
+            for field, words in self._track_words(track_info).items():
+                for word in words:
+                    self._index[(field, word)].add(track_info['uri'])
+
+    def _track_words(self, track_info):
+        return {
+            'track': set(_words(track_info['name'])),
+            'artist': set(word for artist in track_info['artists'] for word in _words(artist['name'])),
+            'album': set(_words(track_info['album']['name'])),
+        }
+
+    def _search(self, q, limit):
+        fields = QUERY_FIELD_PATTERN.findall(q)
+        if fields:
+            terms = [(field, word) for field, value in fields for word in _words(value)]
+        else:
+            terms = [(field, word) for word in _words(q) for field in ('track', 'artist', 'album')]
+
+        if fields:
+            uris = None
+            for term in terms:
+                uris = self._index.get(term, set()) if uris is None else uris & self._index.get(term, set())
+                if not uris:
+                    break
+        else:
+            # Free text matches every word, in any of the fields
+            uris = None
+            for word in set(word for field, word in terms):
+                word_uris = set()
+                for field in ('track', 'artist', 'album'):
+                    word_uris |= self._index.get((field, word), set())
+                uris = word_uris if uris is None else uris & word_uris
+                if not uris:
+                    break
+
+        return [copy.deepcopy(self.catalog[uri]) for uri in sorted(uris or ())[:limit]]
+
+    def _get(self, url, args=None, payload=None, q=None, limit=10, offset=0, type='track', market=None, **kwargs):
+        self._call('search')
+        return {'tracks': {'items': self._search(q, limit)}}
+
+    def search(self, q, limit=10, offset=0, type='track', market=None):
+        return self._get('search', q=q, limit=limit, offset=offset, type=type, market=market)
+
+    def _playlist(self, playlist_id):
+        return self.playlists[playlist_id.split(':')[-1]]
+
+    def _playlist_info(self, playlist_id):
+        playlist = self.playlists[playlist_id]
+        return {
+            'id': playlist_id,
+            'uri': 'spotify:user:{}:playlist:{}'.format(self.username, playlist_id),
+            'name': playlist['name'],
+            'owner': {'id': self.username},
+            'snapshot_id': playlist['snapshot_id'],
+            'tracks': {'total': len(playlist['items'])},
+        }
+
+    def _new_snapshot(self, playlist):
+        self._snapshots += 1
+        playlist['snapshot_id'] = 'snapshot-{}'.format(self._snapshots)
+        return {'snapshot_id': playlist['snapshot_id']}
+
+    def touch_playlists(self):
+        """
+        Gives every playlist a new snapshot, as if they'd been edited elsewhere
+        """
+        with self._lock:
+            for playlist in self.playlists.values():
+                self._new_snapshot(playlist)
+
+    def user_playlists(self, user, limit=50, offset=0):
+        self._call('user_playlists')
+        playlist_ids = sorted(self.playlists)
+        return {
+            'items': [self._playlist_info(playlist_id) for playlist_id in playlist_ids[offset:offset + limit]],
+            'next': {'kind': 'playlists', 'offset': offset + limit} if offset + limit < len(playlist_ids) else None,
+        }
+
+    def user_playlist_create(self, user, name, public=True):
+        self._call('user_playlist_create')
+        with self._lock:
+            # Never reusing the id of a deleted playlist
+            playlist_id = 'playlist{}'.format(self._created)
+            self._created += 1
+            self.playlists[playlist_id] = {'name': name, 'items': []}
+            self._new_snapshot(self.playlists[playlist_id])
+        return self._playlist_info(playlist_id)
+
+    def user_playlist_tracks(self, user, playlist_id=None, fields=None, limit=100, offset=0, market=None):
+        self._call('user_playlist_tracks')
+        items = self._playlist(playlist_id)['items']
+        limit = min(limit, self.PAGE_SIZE)
+        return {
+            'items': copy.deepcopy(items[offset:offset + limit]),
+            'next': {
+                'kind': 'tracks',
+                'playlist_id': playlist_id,
+                'offset': offset + limit,
+            } if offset + limit < len(items) else None,
+        }
+
+    def next(self, result):
+        page = result['next']
+        if not page:
+            return None
+        if page['kind'] == 'playlists':
+            return self.user_playlists(self.username, offset=page['offset'])
+        return self.user_playlist_tracks(self.username, page['playlist_id'], offset=page['offset'])
+
+    def user_playlist_add_tracks(self, user, playlist_id, tracks, position=None):
+        self._call('user_playlist_add_tracks')
+        if len(tracks) > 100:
+            raise ValueError("Too many tracks added at once: {}".format(len(tracks)))
+
+        items = [
+            {'added_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'track': self.catalog[uri]}
+            for uri in tracks
+        ]
+        with self._lock:
+            playlist = self._playlist(playlist_id)
+            if position is None:
+                playlist['items'].extend(items)
+            else:
+                playlist['items'][position:position] = items
+            return self._new_snapshot(playlist)
+
+    def user_playlist_remove_specific_occurrences_of_tracks(self, user, playlist_id, tracks, snapshot_id=None):
+        self._call('user_playlist_remove_specific_occurrences_of_tracks')
+        if len(tracks) > 100:
+            raise ValueError("Too many tracks removed at once: {}".format(len(tracks)))
+
+        with self._lock:
+            playlist = self._playlist(playlist_id)
+            items = playlist['items']
+            removed = set()
+            for track in tracks:
+                for position in track['positions']:
+                    if position >= len(items) or items[position]['track']['uri'] != track['uri']:
+                        raise ValueError("No {} at position {}".format(track['uri'], position))
+                    removed.add(position)
+            playlist['items'] = [item for position, item in enumerate(items) if position not in removed]
+            return self._new_snapshot(playlist)
+
+    def user_playlist_reorder_tracks(self, user, playlist_id, range_start, insert_before, range_length=1,
+                                     snapshot_id=None):
+        self._call('user_playlist_reorder_tracks')
+        with self._lock:
+            playlist = self._playlist(playlist_id)
+            items = playlist['items']
+            if range_start + range_length > len(items) or insert_before > len(items):
+                raise ValueError("Reorder out of range")
+
+            block = items[range_start:range_start + range_length]
+            del items[range_start:range_start + range_length]
+            if insert_before > range_start:
+                insert_before -= range_length
+            items[insert_before:insert_before] = block
+            return self._new_snapshot(playlist)
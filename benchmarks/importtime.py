@@ -0,0 +1,94 @@
+"""
+Measures how long importing TuneZinc's entry point & modules takes in a fresh interpreter, with
+python's -X importtime, reporting the best cumulative time of each module over a few runs and the
+slowest imports it pulls in:
+
+    python -m benchmarks.importtime --repeat 5 --top 10
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODULES = ('config', 'app.tunezinc', 'tunezinc')
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def measure(module):
+    """
+    Returns a (name, self microseconds, cumulative microseconds, depth) tuple for the module, its
+    parent packages and every module they imported, when importing it in a fresh interpreter
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        cwd=BASE_PATH,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    parts = module.split('.')
+    packages = set('.'.join(parts[:end]) for end in range(1, len(parts) + 1))
+
+    # Imports are listed after everything they imported, so each top level import closes the
+    # block of the ones before it. Skip the blocks of the interpreter's own startup imports.
+    imports = []
+    block = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_time, cumulative_time, indent, name = match.groups()
+        block.append((name, int(self_time), int(cumulative_time), len(indent) // 2))
+        if not indent:
+            if name in packages:
+                imports.extend(block)
+            block = []
+    return imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark how long importing TuneZinc takes")
+    parser.add_argument('--modules', nargs='+', default=list(MODULES), help="the modules to import")
+    parser.add_argument('--repeat', type=int, default=3, help="how many times to import each module")
+    parser.add_argument('--top', type=int, default=5, help="how many of the slowest imports to list")
+    parser.add_argument('--json', help="also write the results to this path as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.modules:
+        runs = [measure(module) for _ in range(max(1, args.repeat))]
+        totals = [
+            sum(cumulative_time for name, self_time, cumulative_time, depth in imports if depth == 0)
+            for imports in runs
+        ]
+        best = runs[totals.index(min(totals))]
+        slowest = sorted(
+            (imports for imports in best if imports[3] > 0),
+            key=lambda imports: imports[2],
+            reverse=True,
+        )[:args.top]
+
+        results.append({
+            'module': module,
+            'best_ms': min(totals) / 1000.0,
+            'slowest': [
+                {'module': name, 'cumulative_ms': cumulative_time / 1000.0, 'self_ms': self_time / 1000.0}
+                for name, self_time, cumulative_time, depth in slowest
+            ],
+        })
+
+        print('{:<16} {:>9.1f}ms'.format(module, min(totals) / 1000.0))
+        for name, self_time, cumulative_time, depth in slowest:
+            print('    {:<40} {:>9.1f}ms'.format(name, cumulative_time / 1000.0))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
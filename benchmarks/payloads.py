@@ -0,0 +1,134 @@
+"""
+Synthetic gmusic & spotify payloads for benchmarking, shaped like the real API responses and with
+the kinds of title noise (feat., edition & version suffixes) the track matcher has to see through
+"""
+import json
+import random
+
+WORDS = (
+    'love night heart fire rain dance dream light girl blue summer gold road home wild young '
+    'river city ghost stars fever storm sugar shadow silver paper glass ocean'
+).split()
+
+
+def _phrase(rng, words=(1, 3)):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(*words))).title()
+
+
+def _noisy_pair(rng, title, album, artists):
+    """
+    Returns the (gmusic title, spotify name, gmusic album, spotify album) of a song, both sides
+    spelling it the different ways the real services do
+    """
+    gmusic_title = spotify_name = title
+    noise = rng.randint(0, 9)
+    if noise == 0 and len(artists) > 1:
+        gmusic_title = '{} (feat. {})'.format(title, artists[-1])
+    elif noise == 1:
+        gmusic_title = '{} (Radio Version)'.format(title)
+        spotify_name = '{} - Radio Version'.format(title)
+    elif noise == 2:
+        gmusic_title = '{} (Deluxe)'.format(title)
+        spotify_name = '{} - Deluxe'.format(title)
+    elif noise == 3 and len(artists) > 1:
+        gmusic_title = '{} feat. {}'.format(title, ' and '.join(artists[1:]))
+
+    gmusic_album = spotify_album = album
+    noise = rng.randint(0, 5)
+    if noise == 0:
+        gmusic_album = '{} (Deluxe)'.format(album)
+        spotify_album = '{} - Deluxe'.format(album)
+    elif noise == 1:
+        gmusic_album = '{} [Explicit]'.format(album)
+    return gmusic_title, spotify_name, gmusic_album, spotify_album
+
+
+def generate(playlist_size, playlists=1, unavailable=0.05, uploaded=0.05, shared=0, seed=0):
+    """
+    Returns a fixture dict of `playlists` gmusic playlists of `playlist_size` entries each (a
+    fraction of them uploaded songs without inline track info), their uploaded songs, and the
+    spotify catalog those songs can be found in (missing the `unavailable` fraction of them). The
+    `shared` fraction of the entries of every playlist but the first are songs of earlier playlists.
+    """
+    rng = random.Random(seed)
+    artists = ['{} {}'.format(_phrase(rng, (1, 1)), _phrase(rng, (1, 2))) for _ in range(max(10, playlist_size // 20))]
+    albums = [_phrase(rng) for _ in range(max(10, playlist_size // 10))]
+
+    catalog = []
+    gmusic_playlists = []
+    uploaded_songs = []
+    for playlist_number in range(playlists):
+        entries = []
+        for entry_number in range(playlist_size):
+            if gmusic_playlists and rng.random() < shared:
+                entry = dict(rng.choice(rng.choice(gmusic_playlists)['tracks']))
+                entry['id'] = 'entry-{}-{}'.format(playlist_number, entry_number)
+                entry['absolutePosition'] = '{:020d}'.format(entry_number)
+                entries.append(entry)
+                continue
+
+            song_number = len(catalog)
+            song_artists = rng.sample(artists, rng.randint(1, 3))
+            title = '{} {}'.format(_phrase(rng), song_number)
+            album = rng.choice(albums)
+            duration = rng.randint(120000, 360000)
+            gmusic_title, spotify_name, gmusic_album, spotify_album = _noisy_pair(rng, title, album, song_artists)
+
+            if rng.random() >= unavailable:
+                catalog.append({
+                    'uri': 'spotify:track:{:022d}'.format(song_number),
+                    'name': spotify_name,
+                    'duration_ms': duration + rng.randint(-1500, 1500),
+                    'artists': [{'name': name} for name in song_artists],
+                    'album': {'name': spotify_album},
+                })
+            else:
+                catalog.append(None)
+
+            track_info = {
+                'title': gmusic_title,
+                'artist': song_artists[0],
+                'album': gmusic_album,
+                'durationMillis': str(duration),
+            }
+            entry = {
+                'id': 'entry-{}-{}'.format(playlist_number, entry_number),
+                'trackId': 'T{:026d}'.format(song_number),
+                'absolutePosition': '{:020d}'.format(entry_number),
+                'lastModifiedTimestamp': '1500000000000000',
+            }
+            if rng.random() < uploaded:
+                track_info['id'] = entry['trackId'] = 'upload-{}'.format(song_number)
+                uploaded_songs.append(track_info)
+            else:
+                track_info['storeId'] = track_info['nid'] = entry['trackId']
+                entry['track'] = track_info
+            entries.append(entry)
+
+        gmusic_playlists.append({
+            'id': 'playlist-{}'.format(playlist_number),
+            'name': 'Benchmark {} #{}'.format(playlist_size, playlist_number),
+            'type': 'USER_GENERATED',
+            'lastModifiedTimestamp': '1500000000000000',
+            'tracks': entries,
+        })
+
+    return {
+        'gmusic_playlists': gmusic_playlists,
+        'uploaded_songs': uploaded_songs,
+        'spotify_catalog': [track_info for track_info in catalog if track_info],
+    }
+
+
+def load(path):
+    """
+    Loads a recorded (or previously generated) fixture, a JSON object with the same keys as the
+    dicts `generate` returns
+    """
+    with open(path) as fixture_file:
+        return json.load(fixture_file)
+
+
+def save(fixture, path):
+    with open(path, 'w') as fixture_file:
+        json.dump(fixture, fixture_file)
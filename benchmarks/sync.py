@@ -0,0 +1,201 @@
+"""
+Benchmarks TuneZinc.sync against fake gmusic & spotify backends serving synthetic (or recorded)
+payloads, reporting wall time, API calls, matcher comparisons & peak memory for each scenario, along
+with the per phase timings & cache hit rates the run's metrics recorded:
+
+- full: the first sync of the playlists into an empty spotify account
+- incremental: a sync after a few tracks were added to each gmusic playlist
+- noop: a sync with nothing to do
+- compare: a --full sync after the spotify playlists changed elsewhere, downloading them and
+  comparing every track against them
+
+Usage:
+
+    python -m benchmarks.sync --sizes 100 1000 10000 50000 --latency 0.002
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import config
+from app.instrumentation import metrics
+from app.tunezinc import Track, TuneZinc
+
+from . import payloads
+from .fakes import CallCounter, FakeMobileclient, FakeMusicmanager, FakeSpotifyClient
+
+SCENARIOS = ('full', 'incremental', 'noop', 'compare')
+
+
+class Settings(object):
+    """
+    The settings in config.py, with every file TuneZinc persists kept in a scratch directory
+    """
+
+    def __init__(self, directory, playlist_names, **overrides):
+        for name in dir(config):
+            if name.isupper():
+                setattr(self, name, getattr(config, name))
+
+        for name in dir(self):
+            if name.endswith('_LOCATION'):
+                setattr(self, name, os.path.join(directory, name.lower()))
+
+        self.GMUSIC_PLAYLISTS = playlist_names
+        self.SPOTIFY_USERNAME = 'benchmark'
+        # The fakes don't rate limit, don't let the client throttle itself either
+        self.SPOTIFY_REQUESTS_PER_SECOND = 0
+        for name, value in overrides.items():
+            setattr(self, name, value)
+
+
+class Benchmark(object):
+
+    def __init__(self, fixture, latency=0, new_tracks=3, measure_memory=True, **settings):
+        self.fixture = fixture
+        self.latency = latency
+        self.new_tracks = new_tracks
+        self.measure_memory = measure_memory
+        self.settings = settings
+        self.calls = CallCounter()
+        self.directory = tempfile.mkdtemp(prefix='tunezinc-benchmark-')
+
+        # Hold back the last few entries of each playlist for the incremental sync to find
+        self._held_back = {}
+        for playlist in fixture['gmusic_playlists']:
+            self._held_back[playlist['id']] = playlist['tracks'][-new_tracks:] if new_tracks else []
+            playlist['tracks'] = playlist['tracks'][:len(playlist['tracks']) - new_tracks]
+
+        self.spotify_client = FakeSpotifyClient(fixture, 'benchmark', self.calls, latency)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _tunezinc(self):
+        """
+        A TuneZinc as a new run would create it, the caches & state it persists aside
+        """
+        Track._spotify_forms_cache.clear()
+        tunezinc = TuneZinc(Settings(
+            self.directory,
+            [playlist['name'] for playlist in self.fixture['gmusic_playlists']],
+            **self.settings
+        ))
+        tunezinc.gmusic._client = FakeMobileclient(self.fixture, self.calls, self.latency)
+        tunezinc.gmusic._manager = FakeMusicmanager(self.fixture, self.calls, self.latency)
+        tunezinc.spotify._client = self.spotify_client
+        return tunezinc
+
+    def _add_held_back_tracks(self):
+        for playlist in self.fixture['gmusic_playlists']:
+            playlist['tracks'].extend(self._held_back[playlist['id']])
+            playlist['lastModifiedTimestamp'] = str(int(playlist['lastModifiedTimestamp']) + 1)
+
+    def run(self, scenario):
+        if scenario == 'incremental':
+            self._add_held_back_tracks()
+        elif scenario == 'compare':
+            # Otherwise the recorded snapshots let even a full sync skip the comparison
+            self.spotify_client.touch_playlists()
+
+        tunezinc = self._tunezinc()
+        self.calls.reset()
+        metrics.reset()
+        if self.measure_memory:
+            tracemalloc.start()
+
+        started = time.perf_counter()
+        summary = tunezinc.sync(full=(scenario == 'compare'))
+        wall_time = time.perf_counter() - started
+
+        peak_memory = None
+        if self.measure_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        run_metrics = metrics.summary()
+        return {
+            'scenario': scenario,
+            'wall_time': wall_time,
+            'peak_memory': peak_memory,
+            'matcher_comparisons': run_metrics['counters'].get('matcher.comparisons', 0),
+            'api_calls': dict(self.calls.counts),
+            'tracks_added': sum(added or 0 for added in summary.values()),
+            'phases': run_metrics['phases'],
+            'caches': run_metrics['caches'],
+        }
+
+
+def format_result(size, result):
+    return '{:>7} {:<12} {:>9.3f}s {:>10} {:>12} {:>8} {}'.format(
+        size,
+        result['scenario'],
+        result['wall_time'],
+        '{:.1f}MB'.format(result['peak_memory'] / 2 ** 20) if result['peak_memory'] is not None else '-',
+        result['matcher_comparisons'],
+        result['tracks_added'],
+        ' '.join('{}={}'.format(name, count) for name, count in sorted(result['api_calls'].items())),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark syncing playlists against fake backends")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="the number of tracks in each playlist to benchmark")
+    parser.add_argument('--playlists', type=int, default=1, help="how many playlists of each size to sync")
+    parser.add_argument('--shared', type=float, default=0,
+                        help="the fraction of each playlist's tracks that are also on earlier playlists")
+    parser.add_argument('--fixture', help="replay a recorded fixture instead of generating one (ignores --sizes)")
+    parser.add_argument('--save-fixture', help="write the generated fixture of the first size to this path")
+    parser.add_argument('--latency', type=float, default=0, help="seconds each fake API call takes")
+    parser.add_argument('--new-tracks', type=int, default=3, help="tracks added to each playlist for the incremental sync")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--no-memory', action='store_true', help="don't trace peak memory, which slows the run")
+    parser.add_argument('--json', help="also write the results to this path as JSON")
+    args = parser.parse_args(argv)
+
+    config.configure_logging()
+    logging.getLogger('app').setLevel(logging.ERROR)
+
+    if args.fixture:
+        fixtures = [payloads.load(args.fixture)]
+    else:
+        fixtures = [payloads.generate(size, playlists=args.playlists, shared=args.shared) for size in args.sizes]
+        if args.save_fixture:
+            payloads.save(fixtures[0], args.save_fixture)
+
+    print('{:>7} {:<12} {:>10} {:>10} {:>12} {:>8} {}'.format(
+        'size', 'scenario', 'wall', 'peak', 'comparisons', 'added', 'api calls'))
+
+    results = []
+    for fixture in fixtures:
+        size = max(len(playlist['tracks']) for playlist in fixture['gmusic_playlists'])
+        benchmark = Benchmark(
+            fixture,
+            latency=args.latency,
+            new_tracks=args.new_tracks,
+            measure_memory=not args.no_memory,
+        )
+        try:
+            for scenario in args.scenarios:
+                result = benchmark.run(scenario)
+                result['size'] = size
+                results.append(result)
+                print(format_result(size, result))
+                sys.stdout.flush()
+        finally:
+            benchmark.close()
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 import os
 import logging
 import re
-from logging import config as logging_config
 
 BASE_PATH = os.path.realpath(os.path.dirname(__file__))
 
@@ -12,35 +11,70 @@ GMUSIC_PLAYLISTS = re.split('\s*;\s*', os.environ.get('GMUSIC_PLAYLISTS', '').st
 
 GMUSIC_CREDENTIALS_STORAGE_LOCATION = os.path.join(BASE_PATH, '.gmusic.credentials')
 
+TUNEZINC_CACHE_LOCATION = os.path.join(BASE_PATH, '.tunezinc.cache')
+TUNEZINC_STATE_LOCATION = os.path.join(BASE_PATH, '.tunezinc.state')
+TUNEZINC_CATALOG_LOCATION = os.path.join(BASE_PATH, '.tunezinc.catalog')
+TUNEZINC_PLAYLIST_WORKERS = int(os.environ.get('TUNEZINC_PLAYLIST_WORKERS', 2))
+TUNEZINC_MATCH_CACHE_SIZE = int(os.environ.get('TUNEZINC_MATCH_CACHE_SIZE', 100000))
+TUNEZINC_MATCH_CACHE_MISS_TTL = int(os.environ.get('TUNEZINC_MATCH_CACHE_MISS_DAYS', 7)) * 24 * 60 * 60
+TUNEZINC_CATALOG_SIZE = int(os.environ.get('TUNEZINC_CATALOG_SIZE', 1000000))
+TUNEZINC_MATCH_PROCESSES = int(os.environ.get('TUNEZINC_MATCH_PROCESSES', 1))
+TUNEZINC_ACCOUNT_WORKERS = int(os.environ.get('TUNEZINC_ACCOUNT_WORKERS', 1))
+TUNEZINC_WATCH_MIN_INTERVAL = int(os.environ.get('TUNEZINC_WATCH_MIN_INTERVAL', 60))
+TUNEZINC_WATCH_MAX_INTERVAL = int(os.environ.get('TUNEZINC_WATCH_MAX_INTERVAL', 900))
+
 SPOTIFY_USERNAME = os.environ.get('SPOTIFY_USERNAME', '')
 SPOTIFY_CREATE_PUBLIC = os.environ.get('SPOTIFY_CREATE_PUBLIC', False)
 SPOTIFY_CLIENT_ID = os.environ.get('SPOTIFY_CLIENT_ID', '')
 SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET', '')
+SPOTIFY_SEARCH_WORKERS = int(os.environ.get('SPOTIFY_SEARCH_WORKERS', 4))
+SPOTIFY_REQUESTS_PER_SECOND = float(os.environ.get('SPOTIFY_REQUESTS_PER_SECOND', 10))
+SPOTIFY_MAX_RETRIES = int(os.environ.get('SPOTIFY_MAX_RETRIES', 5))
+SPOTIFY_MATCH_THRESHOLD = float(os.environ.get('SPOTIFY_MATCH_THRESHOLD', 0.8))
+SPOTIFY_TOKEN_LOCATION = os.path.join(BASE_PATH, '.spotify.token')
+SPOTIFY_TOKEN_URL = os.environ.get('SPOTIFY_TOKEN_URL', 'https://accounts.spotify.com/api/token')
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.environ.get('SPOTIFY_TOKEN_REFRESH_MARGIN', 300))
 
 log_output_level = logging.DEBUG if DEBUG else logging.INFO
 
-logging_config.dictConfig({
-    'version': 1,
-    'formatters': {
-        'default': {
-            'format': '%(asctime)s %(name)-12s %(levelname)-8s %(message)s'
-        }
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'default',
-            'level': log_output_level
-        }
-    },
-    'loggers': {
-        'app': {
-            'handlers': ['console'],
-            'level': log_output_level
+
+def configure_logging():
+    """
+    Sets up logging. Called by the entry points rather than on import, so importing the settings
+    stays cheap.
+    """
+    from logging import config as logging_config
+
+    logging_config.dictConfig({
+        'version': 1,
+        # The app's loggers are created on import, before this is called
+        'disable_existing_loggers': False,
+        'formatters': {
+            'default': {
+                'format': '%(asctime)s %(name)-12s %(levelname)-8s %(playlist)s%(message)s'
+            }
+        },
+        'filters': {
+            'playlist': {
+                '()': 'app.logcontext.PlaylistContextFilter'
+            }
+        },
+        'handlers': {
+            'console': {
+                'class': 'logging.StreamHandler',
+                'formatter': 'default',
+                'filters': ['playlist'],
+                'level': log_output_level
+            }
         },
-        'gmusicapi': {
-            'handlers': ['console'] if DEBUG else [],
-            'level': log_output_level
+        'loggers': {
+            'app': {
+                'handlers': ['console'],
+                'level': log_output_level
+            },
+            'gmusicapi': {
+                'handlers': ['console'] if DEBUG else [],
+                'level': log_output_level
+            }
         }
-    }
-})
+    })
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app.ratelimit import RequestScheduler
+from app.spotify import Spotify, SpotifyClient
+
+
+class StubResponse(object):
+    def __init__(self, status=200, body=None, headers=None, delay=0):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.delay = delay
+
+
+class StubSpotifyServer(object):
+    """
+    A local stand-in for the spotify web API. Requests get the responses queued for their method in
+    turn, then whatever `respond(method, path, query, body)` returns. Every request is recorded.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.queued = {}
+        self.respond = lambda method, path, query, body: StubResponse(body={})
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/v1/'.format(self._server.server_port)
+
+    @property
+    def token_url(self):
+        return 'http://127.0.0.1:{}/api/token'.format(self._server.server_port)
+
+    def queue(self, method, *responses):
+        with self._lock:
+            self.queued.setdefault(method, []).extend(responses)
+
+    def requests_for(self, method):
+        return [request for request in self.requests if request[0] == method]
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _response(self, method, path, query, body):
+        with self._lock:
+            self.requests.append((method, path, query, body))
+            queued = self.queued.get(method)
+            if queued:
+                return queued.pop(0)
+        return self.respond(method, path, query, body)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode() if length else None
+                if body and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    body = {name: values[0] for name, values in parse_qs(body).items()}
+                elif body:
+                    body = json.loads(body)
+                query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                response = stub._response(self.command, url.path, query, body)
+                if response.delay:
+                    time.sleep(response.delay)
+
+                data = json.dumps(response.body).encode() if response.body is not None else b''
+                try:
+                    self.send_response(response.status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting
+                    pass
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def search_results(*tracks):
+    """
+    The body of a track search response finding the (name, artist, album) tracks
+    """
+    return {'tracks': {'items': [
+        {
+            'uri': u'spotify:track:{}'.format(name.replace(' ', '-')),
+            'name': name,
+            'artists': [{'name': artist}],
+            'album': {'name': album},
+            'duration_ms': 200000,
+        }
+        for name, artist, album in tracks
+    ]}}
+
+
+class StaticToken(object):
+    def get_access_token(self):
+        return 'token'
+
+
+@pytest.fixture
+def spotify_server():
+    server = StubSpotifyServer()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def scheduler():
+    return RequestScheduler(rate=0, max_retries=3, backoff_base=0.001, backoff_cap=0.01)
+
+
+@pytest.fixture
+def spotify_client(spotify_server, scheduler):
+    client = SpotifyClient(scheduler, client_credentials_manager=StaticToken(), requests_timeout=0.5)
+    client.prefix = spotify_server.url
+    return client
+
+
+@pytest.fixture
+def spotify(spotify_client, scheduler):
+    spotify = Spotify('user', 'id', 'secret', scheduler=scheduler)
+    spotify._client = spotify_client
+    return spotify
@@ -0,0 +1,31 @@
+import sqlite3
+
+from app.cache import TrackInfoCache
+from app.records import GmusicTrack
+
+
+def test_track_info_keeps_the_duration(tmp_path):
+    cache = TrackInfoCache(str(tmp_path / 'cache'))
+    cache.set_many({
+        'song': GmusicTrack('song', u'Title', u'Artist', u'Album', 215000),
+        'unknown': GmusicTrack('unknown'),
+    })
+
+    track_infos = TrackInfoCache(str(tmp_path / 'cache')).get_many(['song', 'unknown', 'other'])
+    assert set(track_infos) == {'song', 'unknown'}
+    assert track_infos['song'].duration_ms == 215000
+    assert track_infos['unknown'].duration_ms is None
+
+
+def test_track_info_cached_without_durations_is_dropped(tmp_path):
+    path = str(tmp_path / 'cache')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE track_info (id TEXT PRIMARY KEY, title TEXT, artist TEXT, album TEXT)')
+    db.execute("INSERT INTO track_info VALUES ('song', 'Title', 'Artist', 'Album')")
+    db.commit()
+    db.close()
+
+    cache = TrackInfoCache(path)
+    assert cache.get_many(['song']) == {}
+    cache.set_many({'song': GmusicTrack('song', u'Title', u'Artist', u'Album', 215000)})
+    assert cache.get_many(['song'])['song'].duration_ms == 215000
@@ -0,0 +1,24 @@
+from app.normalize import LRUCache
+
+
+def test_evicts_the_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+
+def test_discards_only_the_same_value():
+    cache = LRUCache()
+    first, second = object(), object()
+    cache.set('query', first)
+    cache.clear()
+    assert cache.setdefault('query', second) is second
+
+    assert not cache.discard('query', first)
+    assert cache.get('query') is second
+    assert cache.discard('query', second)
+    assert cache.get('query') is None
@@ -0,0 +1,74 @@
+import pytest
+import requests
+from spotipy import SpotifyException
+
+from app.ratelimit import RequestScheduler
+from app.spotify import SpotifyClient
+
+from .conftest import StubResponse
+
+
+def test_retries_failed_reads(spotify_server, spotify_client):
+    spotify_server.queue('GET', StubResponse(503), StubResponse(500))
+    spotify_server.respond = lambda method, path, query, body: StubResponse(body={'id': 'playlist'})
+
+    assert spotify_client.user_playlist('user', 'playlist') == {'id': 'playlist'}
+    assert len(spotify_server.requests_for('GET')) == 3
+
+
+def test_retries_timed_out_reads(spotify_server, spotify_client):
+    spotify_server.queue('GET', StubResponse(body={}, delay=1))
+    spotify_server.respond = lambda method, path, query, body: StubResponse(body={'id': 'playlist'})
+
+    assert spotify_client.user_playlist('user', 'playlist') == {'id': 'playlist'}
+    assert len(spotify_server.requests_for('GET')) == 2
+
+
+def test_gives_up_after_max_retries(spotify_server, spotify_client):
+    spotify_server.respond = lambda method, path, query, body: StubResponse(502)
+
+    with pytest.raises(SpotifyException) as excinfo:
+        spotify_client.user_playlist('user', 'playlist')
+    assert excinfo.value.http_status == 502
+    assert len(spotify_server.requests_for('GET')) == 4
+
+
+def test_retries_rate_limited_writes(spotify_server, spotify_client):
+    spotify_server.queue('POST', StubResponse(429, headers={'Retry-After': '0'}))
+    spotify_server.respond = lambda method, path, query, body: StubResponse(201, body={'snapshot_id': 's'})
+
+    result = spotify_client.user_playlist_add_tracks('user', 'playlist', ['spotify:track:a'])
+    assert result == {'snapshot_id': 's'}
+    assert len(spotify_server.requests_for('POST')) == 2
+
+
+@pytest.mark.parametrize('response', [StubResponse(500), StubResponse(503)])
+def test_doesnt_retry_failed_writes(spotify_server, spotify_client, response):
+    # The tracks may well have been added, adding them again would duplicate them
+    spotify_server.queue('POST', response)
+
+    with pytest.raises(SpotifyException):
+        spotify_client.user_playlist_add_tracks('user', 'playlist', ['spotify:track:a'])
+    assert len(spotify_server.requests_for('POST')) == 1
+
+
+def test_doesnt_retry_timed_out_writes(spotify_server, spotify_client):
+    spotify_server.queue('PUT', StubResponse(body={'snapshot_id': 's'}, delay=1))
+
+    with pytest.raises(requests.Timeout):
+        spotify_client.user_playlist_reorder_tracks('user', 'playlist', 3, 0)
+    assert len(spotify_server.requests_for('PUT')) == 1
+
+
+def test_doesnt_retry_failed_removals(spotify_server, spotify_client):
+    spotify_server.queue('DELETE', StubResponse(500))
+
+    with pytest.raises(SpotifyException):
+        spotify_client.user_playlist_remove_specific_occurrences_of_tracks(
+            'user', 'playlist', [{'uri': 'spotify:track:a', 'positions': [0]}])
+    assert len(spotify_server.requests_for('DELETE')) == 1
+
+
+def test_requests_time_out_by_default():
+    client = SpotifyClient(RequestScheduler(rate=0))
+    assert client.requests_timeout == SpotifyClient.REQUESTS_TIMEOUT
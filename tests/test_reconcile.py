@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from app.reconcile import edit_script, target_uris, tracks_touched
+
+
+def apply(current, operations):
+    """
+    Carries out the operations the way the spotify API does
+    """
+    playlist = list(current)
+    for operation in operations:
+        if operation[0] == 'remove':
+            removed = set()
+            for track in operation[1]:
+                for position in track['positions']:
+                    assert playlist[position] == track['uri']
+                    removed.add(position)
+            playlist = [uri for position, uri in enumerate(playlist) if position not in removed]
+        elif operation[0] == 'add':
+            playlist[operation[2]:operation[2]] = operation[1]
+        else:
+            name, range_start, range_length, insert_before = operation
+            block = playlist[range_start:range_start + range_length]
+            rest = playlist[:range_start] + playlist[range_start + range_length:]
+            if insert_before > range_start:
+                insert_before -= range_length
+            playlist = rest[:insert_before] + block + rest[insert_before:]
+    return playlist
+
+
+@pytest.mark.parametrize('current, target, expected', [
+    ('abcdef', 'abdcef', [('reorder', 2, 1, 4)]),
+    ('abcdef', 'abcdxef', [('add', ['x'], 4)]),
+    ('abcdef', 'abdef', [('remove', [{'uri': 'c', 'positions': [2]}])]),
+    ('abcdef', 'fabcde', [('reorder', 5, 1, 0)]),
+    ('abcdef', 'abcdef', []),
+])
+def test_touches_only_what_changed(current, target, expected):
+    assert edit_script(list(current), list(target)) == expected
+
+
+def test_edits_into_target_order():
+    rng = random.Random(1)
+    for trial in range(2000):
+        alphabet = ['u{}'.format(number) for number in range(rng.randint(1, 30))]
+        current = [rng.choice(alphabet) for _ in range(rng.randint(0, 40))]
+        target = list(current)
+        for _ in range(rng.randint(0, 6)):
+            if rng.random() < 0.3 and target:
+                del target[rng.randrange(len(target))]
+            elif rng.random() < 0.5:
+                target.insert(rng.randint(0, len(target)), rng.choice(alphabet + ['new']))
+            elif target:
+                target.insert(rng.randint(0, len(target) - 1), target.pop(rng.randrange(len(target))))
+        if rng.random() < 0.1:
+            rng.shuffle(target)
+
+        assert apply(current, edit_script(current, target)) == target
+
+
+def test_reverses_a_big_playlist():
+    current = ['t{}'.format(number) for number in range(5000)]
+    target = current[::-1]
+    operations = edit_script(current, target)
+    assert apply(current, operations) == target
+    assert tracks_touched(operations) == len(current) - 1
+
+
+def test_unresolved_entries_keep_their_stand_in():
+    assert target_uris(list('abxcd'), ['a', 'b', None, 'c', 'd']) == list('abxcd')
+    assert target_uris(list('xabc'), [None, 'a', 'c']) == list('xac')
+
+
+def test_tracks_no_entry_accounts_for_are_dropped():
+    assert target_uris(list('abxcd'), ['a', 'b', 'c', 'd']) == list('abcd')
+    assert target_uris(list('abc'), ['a', None, 'b', 'c']) == list('abc')
+    assert target_uris(list('abac'), ['a', 'b', 'c']) == list('abc')
@@ -0,0 +1,53 @@
+import pytest
+
+from app.records import SpotifyTrack
+from app.scoring import CandidateScorer
+from app.tunezinc import Track
+
+
+def spotify_track(name, artist=u'Artist', album=u'Album', duration_ms=200000):
+    return SpotifyTrack(u'spotify:track:{}'.format(name), name, [artist], album, duration_ms)
+
+
+@pytest.mark.parametrize('title, spotify_name', [
+    (u'Part 1', u'Part 2'),
+    (u'Love Song', u'Love Story'),
+    (u'Intro', u'Outro'),
+    (u'Yesterday', u'Yesterday - Live'),
+    (u'Heroes', u'Heroes (Remix)'),
+    (u'Heroes', u'Heroes - Instrumental'),
+    (u'Heroes', u'Heroes - Acoustic Version'),
+])
+def test_rejects_near_misses(title, spotify_name):
+    track = Track(title, u'Artist', u'Album', duration_ms=200000)
+    match, score = CandidateScorer().best_match(track, [spotify_track(spotify_name)])
+    assert match is None
+
+
+@pytest.mark.parametrize('title, spotify_name', [
+    (u'Yesterday', u'Yesterday - Remastered 2009'),
+    (u'Heroes', u'Heroes (2017 Remaster)'),
+    (u'Heroes', u'Heroes - 2017 Remastered Version'),
+    (u'Heroes', u'Heroes (Mono)'),
+    (u'Dont Stop Me Now', u"Don't Stop Me Now"),
+])
+def test_accepts_the_same_recording(title, spotify_name):
+    track = Track(title, u'Artist', u'Album', duration_ms=200000)
+    candidate = spotify_track(spotify_name)
+    match, score = CandidateScorer().best_match(track, [candidate])
+    assert match is candidate
+
+
+def test_title_gate_applies_before_weighting():
+    # Everything but the title matches perfectly, which used to carry "Part 2" over the threshold
+    track = Track(u'Part 1', u'Artist', u'Album', duration_ms=200000)
+    spotify_forms = Track.normalize_spotify_track(spotify_track(u'Part 2'))
+    assert CandidateScorer().score(track, spotify_forms, 200000) == 0.0
+
+
+def test_prefers_the_closest_candidate():
+    track = Track(u'Yesterday', u'Artist', u'Album', duration_ms=200000)
+    live = spotify_track(u'Yesterday - Live')
+    remastered = spotify_track(u'Yesterday - Remastered', album=u'Album (Deluxe)')
+    match, score = CandidateScorer().best_match(track, [live, remastered])
+    assert match is remastered
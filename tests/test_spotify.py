@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.spotify import Spotify
+from app.tunezinc import Track
+
+from .conftest import StubResponse, search_results
+
+
+def resolved_tracks(count):
+    tracks = []
+    for number in range(count):
+        track = Track(u'Title {}'.format(number), u'Artist', u'Album')
+        track.spotify_uri = u'spotify:track:{}'.format(number)
+        tracks.append(track)
+    return tracks
+
+
+def added_uris(spotify_server):
+    return [uri for method, path, query, body in spotify_server.requests_for('POST') for uri in body]
+
+
+def test_retries_a_failed_chunk_in_place(spotify_server, spotify, monkeypatch):
+    monkeypatch.setattr(spotify, 'ADD_TRACKS_CHUNK_SIZE', 2)
+    spotify_server.queue('POST', StubResponse(201, body={'snapshot_id': '1'}), StubResponse(500))
+    spotify_server.respond = lambda method, path, query, body: StubResponse(201, body={'snapshot_id': '2'})
+    playlist = {'uri': 'spotify:user:user:playlist:playlist', 'name': 'Playlist'}
+    tracks = resolved_tracks(5)
+
+    assert spotify.add_tracks_to_playlist(playlist, tracks) == tracks
+    uris = [track.spotify_uri for track in tracks]
+    assert added_uris(spotify_server) == uris[:2] + uris[2:4] + uris[2:4] + uris[4:]
+    assert playlist['snapshot_id'] == '2'
+
+
+def test_skips_a_chunk_that_keeps_failing(spotify_server, spotify, monkeypatch):
+    monkeypatch.setattr(spotify, 'ADD_TRACKS_CHUNK_SIZE', 2)
+    spotify_server.queue('POST', StubResponse(201, body={}), StubResponse(500), StubResponse(500))
+    spotify_server.respond = lambda method, path, query, body: StubResponse(201, body={})
+    playlist = {'uri': 'spotify:user:user:playlist:playlist', 'name': 'Playlist'}
+    tracks = resolved_tracks(5)
+
+    added = spotify.add_tracks_to_playlist(playlist, tracks)
+    assert added == tracks[:2] + tracks[4:]
+
+
+def search_by_query(results):
+    def respond(method, path, query, body):
+        return StubResponse(body=results.get(query['q'], search_results()))
+    return respond
+
+
+def test_takes_close_titles_from_the_strictest_query(spotify_server, spotify):
+    track = Track(u'Dont Stop Me Now', u'Queen', u'Jazz')
+    spotify_server.respond = search_by_query({
+        u'track:"Dont Stop Me Now" artist:"Queen" album:"Jazz"': search_results(
+            (u"Don't Stop Me Now", u'Queen', u'Jazz')),
+    })
+
+    assert spotify.find_track(track) is track
+    assert track.spotify_uri == u"spotify:track:Don't-Stop-Me-Now"
+
+
+def test_only_takes_exact_titles_from_fallback_queries(spotify_server, spotify):
+    track = Track(u'Dont Stop Me Now', u'Queen', u'Jazz')
+    spotify_server.respond = search_by_query({
+        u'track:"Dont Stop Me Now" artist:"Queen"': search_results((u"Don't Stop Me Now", u'Queen', u'Jazz')),
+        u'Dont Stop Me Now Queen': search_results((u"Don't Stop Me Now", u'Queen', u'Jazz')),
+    })
+
+    assert spotify.find_track(track) is None
+    assert len(spotify_server.requests_for('GET')) == 3
+
+
+def test_takes_exact_titles_from_fallback_queries(spotify_server, spotify):
+    track = Track(u'Bohemian Rhapsody', u'Queen', u'A Night at the Opera')
+    spotify_server.respond = search_by_query({
+        u'Bohemian Rhapsody Queen': search_results(
+            (u'Bohemian Rhapsodies', u'Queen', u'A Night at the Opera'),
+            (u'Bohemian Rhapsody', u'Queen', u'A Night at the Opera (Deluxe Edition)'),
+        ),
+    })
+
+    assert spotify.find_track(track) is track
+    assert track.spotify_uri == u'spotify:track:Bohemian-Rhapsody'
+
+
+def searching(tracks, delay=0):
+    """
+    Responds to each track's strictest search with the track, noting the most searches in flight
+    """
+    in_flight = [0, 0]
+    lock = threading.Lock()
+    results = {
+        u'track:"{}" artist:"{}" album:"{}"'.format(track.title, track.artist, track.album):
+            search_results((track.title, track.artist, track.album))
+        for track in tracks
+    }
+
+    def respond(method, path, query, body):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(delay)
+        with lock:
+            in_flight[0] -= 1
+        return StubResponse(body=results.get(query['q'], search_results()))
+
+    respond.most_in_flight = lambda: in_flight[1]
+    return respond
+
+
+def tracks_to_find(count):
+    return [Track(u'Title {}'.format(number), u'Artist {}'.format(number), u'Album') for number in range(count)]
+
+
+@pytest.fixture
+def concurrent_spotify(spotify_client, scheduler):
+    spotify = Spotify('user', 'id', 'secret', search_workers=4, scheduler=scheduler)
+    spotify._client = spotify_client
+    return spotify
+
+
+def test_finds_tracks_concurrently_in_order(spotify_server, concurrent_spotify):
+    tracks = tracks_to_find(12)
+    spotify_server.respond = respond = searching(tracks, delay=0.05)
+
+    found = list(concurrent_spotify.find_tracks(tracks))
+    assert found == tracks
+    assert [track.spotify_uri for track in found] == [
+        u'spotify:track:Title-{}'.format(number) for number in range(12)]
+    assert respond.most_in_flight() > 1
+
+
+def test_searches_for_the_same_track_once(spotify_server, concurrent_spotify):
+    tracks = tracks_to_find(3)
+    spotify_server.respond = searching(tracks, delay=0.05)
+
+    duplicates = [Track(track.title, track.artist, track.album) for track in tracks]
+    found = list(concurrent_spotify.find_tracks(tracks + duplicates))
+    assert [track.spotify_uri for track in found[3:]] == [track.spotify_uri for track in found[:3]]
+    assert len(spotify_server.requests_for('GET')) == 3
+
+
+def test_finds_tracks_through_rate_limits_and_failures(spotify_server, concurrent_spotify):
+    tracks = tracks_to_find(8)
+    spotify_server.queue(
+        'GET',
+        StubResponse(429, headers={'Retry-After': '0'}),
+        StubResponse(503),
+        StubResponse(body={}, delay=1),
+    )
+    spotify_server.respond = searching(tracks)
+
+    found = list(concurrent_spotify.find_tracks(tracks))
+    assert found == tracks
+    assert all(track.spotify_uri for track in found)
+    assert len(spotify_server.requests_for('GET')) == len(tracks) + 3
+
+
+class LockedCatalog(object):
+    def add(self, spotify_tracks):
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_a_failing_catalog_doesnt_fail_the_search(spotify_server, spotify):
+    spotify.catalog = LockedCatalog()
+    spotify_server.respond = lambda method, path, query, body: StubResponse(
+        body=search_results((u'Title', u'Artist', u'Album')))
+
+    assert [track.name for track in spotify.search_tracks(u'Title')] == [u'Title']
+    # The memoized search was resolved, so searching again doesn't wait on it
+    assert [track.name for track in spotify.search_tracks(u'Title')] == [u'Title']
+    assert len(spotify_server.requests_for('GET')) == 1
+
+
+def test_an_unreadable_search_result_doesnt_leave_others_waiting(spotify_server, spotify):
+    spotify_server.respond = lambda method, path, query, body: StubResponse(body={'tracks': {'items': [None]}})
+    searches = ThreadPoolExecutor(max_workers=2)
+    first = searches.submit(spotify.search_tracks, u'Other')
+    second = searches.submit(spotify.search_tracks, u'Other')
+    for search in (first, second):
+        with pytest.raises(AttributeError):
+            search.result(timeout=5)
+    searches.shutdown()
+    assert spotify._searches.get(u'Other') is None
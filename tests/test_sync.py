@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+from spotipy import SpotifyException
+
+from benchmarks import payloads
+from benchmarks.sync import Benchmark
+
+
+@pytest.fixture
+def benchmark():
+    fixture = payloads.generate(40, playlists=2, unavailable=0, uploaded=0)
+    benchmark = Benchmark(fixture, new_tracks=2, measure_memory=False)
+    yield benchmark
+    benchmark.close()
+
+
+def playlist_sizes(benchmark):
+    return {playlist['name']: len(playlist['items']) for playlist in benchmark.spotify_client.playlists.values()}
+
+
+def delete_playlists(benchmark):
+    benchmark.spotify_client.playlists.clear()
+
+
+def test_refills_a_deleted_spotify_playlist(benchmark):
+    benchmark._tunezinc().sync()
+    synced = playlist_sizes(benchmark)
+
+    delete_playlists(benchmark)
+    assert benchmark._tunezinc().sync() == synced
+    assert playlist_sizes(benchmark) == synced
+
+
+def test_refills_a_deleted_spotify_playlist_after_gmusic_changed(benchmark):
+    benchmark._tunezinc().sync()
+    synced = playlist_sizes(benchmark)
+
+    delete_playlists(benchmark)
+    benchmark._add_held_back_tracks()
+    benchmark._tunezinc().sync()
+    assert playlist_sizes(benchmark) == {name: size + 2 for name, size in synced.items()}
+
+
+def test_plans_to_refill_a_deleted_spotify_playlist(benchmark):
+    benchmark._tunezinc().sync()
+    synced = playlist_sizes(benchmark)
+
+    delete_playlists(benchmark)
+    plan = benchmark._tunezinc().plan()
+    assert plan['unchanged'] == []
+    assert {playlist['gmusic_playlist']['name']: len(playlist['add']) for playlist in plan['playlists']} == synced
+
+
+@pytest.fixture
+def fuzzy_benchmark():
+    # Some tracks aren't on spotify, so the track counts never match. Only a fuzzy match finds the
+    # others, the playlist index only finds exact ones.
+    fixture = payloads.generate(40, playlists=2, unavailable=0.2, uploaded=0)
+    for track_info in fixture['spotify_catalog']:
+        track_info['name'] = u'{}!'.format(track_info['name'])
+    benchmark = Benchmark(fixture, new_tracks=0, measure_memory=False)
+    yield benchmark
+    benchmark.close()
+
+
+def test_full_syncs_dont_add_fuzzily_matched_tracks_again(fuzzy_benchmark):
+    benchmark = fuzzy_benchmark
+    benchmark._tunezinc().sync()
+    synced = playlist_sizes(benchmark)
+    assert all(synced.values())
+
+    for run in range(2):
+        # Edited elsewhere, so the full sync compares every track again
+        benchmark.spotify_client.touch_playlists()
+        assert set(benchmark._tunezinc().sync(full=True).values()) == {0}
+        assert playlist_sizes(benchmark) == synced
+
+
+def test_a_failing_search_only_fails_its_track(benchmark, monkeypatch):
+    failing_title = benchmark.fixture['gmusic_playlists'][0]['tracks'][0]['track']['title']
+    search = benchmark.spotify_client._get
+
+    def failing_search(url, q=None, **kwargs):
+        if failing_title in q:
+            raise SpotifyException(400, -1, 'search:\n Bad request')
+        return search(url, q=q, **kwargs)
+
+    monkeypatch.setattr(benchmark.spotify_client, '_get', failing_search)
+    summary = benchmark._tunezinc().sync()
+    assert None not in summary.values()
+    added = summary[benchmark.fixture['gmusic_playlists'][0]['name']]
+
+    # The failure isn't remembered as a miss, so the track is found once searching works again
+    monkeypatch.setattr(benchmark.spotify_client, '_get', search)
+    benchmark.spotify_client.touch_playlists()
+    summary = benchmark._tunezinc().sync(full=True)
+    assert summary[benchmark.fixture['gmusic_playlists'][0]['name']] == 1
+    assert playlist_sizes(benchmark)[benchmark.fixture['gmusic_playlists'][0]['name']] == added + 1
+
+
+def test_adds_tracks_while_later_ones_are_still_being_resolved(monkeypatch):
+    fixture = payloads.generate(250, playlists=1, unavailable=0, uploaded=0)
+    benchmark = Benchmark(fixture, new_tracks=0, measure_memory=False)
+    later_titles = set(entry['track']['title'] for entry in fixture['gmusic_playlists'][0]['tracks'][150:])
+    search = benchmark.spotify_client._get
+    add_tracks = benchmark.spotify_client.user_playlist_add_tracks
+    added = threading.Event()
+
+    def add_tracks_and_notify(*args, **kwargs):
+        result = add_tracks(*args, **kwargs)
+        added.set()
+        return result
+
+    def late_search(url, q=None, **kwargs):
+        # The searches for the later tracks hold out until the first chunk has been added
+        if any(u'"{}"'.format(title) in q for title in later_titles) and not added.wait(timeout=5):
+            # Only holding out once when they're never added
+            added.set()
+        return search(url, q=q, **kwargs)
+
+    monkeypatch.setattr(benchmark.spotify_client, 'user_playlist_add_tracks', add_tracks_and_notify)
+    monkeypatch.setattr(benchmark.spotify_client, '_get', late_search)
+    try:
+        started = time.monotonic()
+        assert list(benchmark._tunezinc().sync().values()) == [250]
+        assert time.monotonic() - started < 5
+    finally:
+        benchmark.close()
@@ -0,0 +1,86 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+from spotipy.oauth2 import SpotifyOauthError
+
+from app.tokens import TokenStore
+
+from .conftest import StubResponse
+
+
+@pytest.fixture
+def token_path(tmp_path):
+    path = str(tmp_path / 'token')
+    with open(path, 'w') as token_file:
+        json.dump({
+            'access_token': 'old',
+            'refresh_token': 'refresh',
+            'expires_in': 3600,
+            'expires_at': int(time.time()) - 10,
+            'scope': 'playlist-read-private',
+        }, token_file)
+    return path
+
+
+def token_store(token_path, spotify_server):
+    return TokenStore(token_path, 'id', 'secret', scope='playlist-read-private', token_url=spotify_server.token_url)
+
+
+def test_refresh_swaps_in_the_new_token(token_path, spotify_server):
+    spotify_server.queue('POST', StubResponse(body={'access_token': 'new', 'token_type': 'Bearer', 'expires_in': 3600}))
+    store = token_store(token_path, spotify_server)
+
+    assert store.get_access_token() == 'new'
+    method, path, query, body = spotify_server.requests_for('POST')[0]
+    assert body == {'grant_type': 'refresh_token', 'refresh_token': 'refresh'}
+    assert store.expires_in > 3500
+
+    with open(token_path) as token_file:
+        saved = json.load(token_file)
+    assert saved['access_token'] == 'new'
+    # Spotify doesn't always send a new refresh token, the old one still works
+    assert saved['refresh_token'] == 'refresh'
+
+
+def test_failed_refresh_keeps_the_old_token(token_path, spotify_server):
+    spotify_server.queue('POST', StubResponse(400, body={'error': 'invalid_grant'}))
+    store = token_store(token_path, spotify_server)
+    with open(token_path) as token_file:
+        stored = token_file.read()
+
+    with pytest.raises(SpotifyOauthError):
+        store.refresh()
+    with store._lock:
+        assert store._token_info['access_token'] == 'old'
+    with open(token_path) as token_file:
+        assert token_file.read() == stored
+
+
+def test_token_file_is_replaced_and_private(token_path, spotify_server):
+    spotify_server.queue('POST', StubResponse(body={'access_token': 'new', 'expires_in': 3600}))
+    store = token_store(token_path, spotify_server)
+    inode = os.stat(token_path).st_ino
+
+    store.refresh()
+    # Written aside then moved over the old file, never truncated in place
+    assert os.stat(token_path).st_ino != inode
+    assert stat.S_IMODE(os.stat(token_path).st_mode) == 0o600
+    assert os.listdir(os.path.dirname(token_path)) == ['token']
+
+
+def test_refreshes_in_the_background_until_stopped(token_path, spotify_server):
+    spotify_server.respond = lambda method, path, query, body: StubResponse(
+        body={'access_token': 'token {}'.format(len(spotify_server.requests)), 'expires_in': 1})
+    store = token_store(token_path, spotify_server)
+
+    store.start()
+    deadline = time.monotonic() + 5
+    while len(spotify_server.requests) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    store.stop()
+    store._thread.join(timeout=5)
+    assert not store._thread.is_alive()
+    assert len(spotify_server.requests) >= 2
@@ -0,0 +1,52 @@
+import pytest
+
+from app.watch import Watcher
+from benchmarks import payloads
+from benchmarks.sync import Benchmark
+
+
+@pytest.fixture
+def benchmark():
+    fixture = payloads.generate(30, playlists=2, unavailable=0, uploaded=0)
+    benchmark = Benchmark(fixture, new_tracks=0, measure_memory=False)
+    yield benchmark
+    benchmark.close()
+
+
+def watcher(benchmark):
+    tunezinc = benchmark._tunezinc()
+    client = tunezinc.spotify._client
+    refresh = tunezinc.spotify.refresh
+
+    def keep_client():
+        refresh()
+        tunezinc.spotify._client = client
+
+    tunezinc.spotify.refresh = keep_client
+    return Watcher(tunezinc)
+
+
+def test_nothing_changes_after_syncing(benchmark):
+    playlists = watcher(benchmark)
+    assert playlists.poll()
+    assert not playlists.poll()
+
+
+def test_empty_playlist_isnt_changed_on_every_poll(benchmark):
+    benchmark.fixture['gmusic_playlists'][1]['tracks'] = []
+    playlists = watcher(benchmark)
+    assert playlists.poll()
+    assert playlists.changed_playlists() == ([], [])
+
+
+def test_playlist_with_nothing_to_sync_isnt_changed_on_every_poll(benchmark):
+    playlists = watcher(benchmark)
+    playlists.poll()
+
+    # Without its sync state, the playlist is found to already be on spotify, and skipped
+    gmusic_playlist = benchmark.fixture['gmusic_playlists'][0]
+    playlists.tunezinc.sync_state.forget(gmusic_playlist['id'])
+    assert [playlist['id'] for playlist in playlists.changed_playlists()[0]] == [gmusic_playlist['id']]
+    assert playlists.poll()
+    assert playlists.tunezinc.sync_state.get(gmusic_playlist['id']) is None
+    assert playlists.changed_playlists() == ([], [])
@@ -1,6 +1,118 @@
+import argparse
+import json
+import sys
+
 import config
-from app.tunezinc import TuneZinc
+from app.instrumentation import metrics, profiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronize your Google Music playlists with Spotify")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="forget every previously matched (and unmatched) track, cached uploaded "
+                             "song info and catalogued spotify track before syncing")
+    parser.add_argument('--full', action='store_true',
+                        help="compare every track of each playlist rather than only those added since the last sync")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--plan', metavar='PATH',
+                        help="only work out what syncing would do, without changing any spotify playlist, "
+                             "and write it to this path as JSON ('-' for stdout)")
+    mode.add_argument('--apply', metavar='PATH', help="carry out a plan written by --plan")
+    mode.add_argument('--reconcile', action='store_true',
+                        help="make each spotify playlist hold exactly its gmusic playlist's tracks, in the "
+                             "same order, removing & moving tracks as well as adding them")
+    mode.add_argument('--watch', action='store_true',
+                        help="keep running, syncing the playlists that change (with --full, the first "
+                             "sync is a full one)")
+    parser.add_argument('--accounts', metavar='PATH',
+                        help="sync every account listed in this JSON file in one process, sharing "
+                             "connections, the rate limit & caches between them")
+    parser.add_argument('--summary', metavar='PATH',
+                        help="with --accounts, write each account's results to this path as JSON ('-' for stdout)")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write a JSON summary of the run's phase timings, API calls & cache hit rates "
+                             "to this path ('-' for stdout)")
+    parser.add_argument('--profile', metavar='PATH', help="profile the run with cProfile, dumping the stats to this path")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="trace memory allocations, adding the peak & biggest allocations to the metrics")
+    args = parser.parse_args()
+    if args.accounts and (args.plan or args.apply or args.watch):
+        parser.error("--accounts can't be combined with --plan, --apply or --watch")
+    config.configure_logging()
+
+    # Imported once the arguments are parsed, so --help doesn't wait on the service modules
+    from app.tunezinc import TuneZinc
+    from app.watch import Watcher
+
+    if args.accounts:
+        from app.batch import BatchRunner
+
+        runner = BatchRunner.from_file(config, args.accounts)
+        if args.clear_cache:
+            runner.match_cache.clear()
+            runner.track_info_cache.clear()
+            runner.catalog.clear()
+        with profiled(args.profile, args.trace_memory):
+            summaries = runner.run(full=args.full, reconcile=args.reconcile)
+
+        if args.summary == '-':
+            json.dump(summaries, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        elif args.summary:
+            with open(args.summary, 'w') as summary_file:
+                json.dump(summaries, summary_file, indent=2)
+        if args.metrics:
+            metrics.write(args.metrics)
+        if not all(summary['ok'] for summary in summaries):
+            sys.exit(1)
+        return
+
+    tunezinc = TuneZinc(config)
+    if args.clear_cache:
+        tunezinc.match_cache.clear()
+        tunezinc.gmusic.track_info_cache.clear()
+        tunezinc.catalog.clear()
+    if args.watch:
+        watcher = Watcher(tunezinc, config.TUNEZINC_WATCH_MIN_INTERVAL, config.TUNEZINC_WATCH_MAX_INTERVAL)
+        try:
+            with profiled(args.profile, args.trace_memory):
+                if args.full:
+                    tunezinc.sync(full=True)
+                watcher.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            tunezinc.close()
+            if args.metrics:
+                metrics.write(args.metrics)
+        return
+
+    try:
+        with profiled(args.profile, args.trace_memory):
+            if args.plan:
+                plan = tunezinc.plan(full=args.full)
+                results = {name: None for name in plan['failed']}
+            elif args.apply:
+                with open(args.apply) as plan_file:
+                    results = tunezinc.apply(json.load(plan_file))
+            elif args.reconcile:
+                results = tunezinc.reconcile()
+            else:
+                results = tunezinc.sync(full=args.full)
+    finally:
+        tunezinc.close()
+
+    if args.plan == '-':
+        json.dump(plan, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    elif args.plan:
+        with open(args.plan, 'w') as plan_file:
+            json.dump(plan, plan_file, indent=2)
+    if args.metrics:
+        metrics.write(args.metrics)
+    if None in results.values():
+        sys.exit(1)
 
-tunezinc = TuneZinc(config)
 
-tunezinc.sync()
+if __name__ == '__main__':
+    main()